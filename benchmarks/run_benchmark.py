@@ -0,0 +1,178 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import threading
+import time
+import urllib.request
+
+from typing import Dict, List, Optional
+
+from benchmarks.stub_server import StubServerConfig, run_stub_server
+from src.comic_source import ComicSource
+from src.cpu_executor import CpuExecutor
+from src.logging_config import configure_logging
+from src.xkcd_async_downloader import XkcdAsyncDownloader
+
+
+class ResourceSampler(threading.Thread):
+    def __init__(self, interval: float = 0.05) -> None:
+        super().__init__(daemon=True)
+        self.__interval = interval
+        self.__stopped = threading.Event()
+        self.peak_open_sockets = 0
+
+    def run(self) -> None:
+        while not self.__stopped.is_set():
+            open_sockets = count_open_sockets()
+            if open_sockets is not None:
+                self.peak_open_sockets = max(self.peak_open_sockets, open_sockets)
+            self.__stopped.wait(self.__interval)
+
+    def stop(self) -> None:
+        self.__stopped.set()
+        self.join()
+
+
+def count_open_sockets() -> Optional[int]:
+    try:
+        file_descriptors = os.listdir('/proc/self/fd')
+    except OSError:
+        return None
+
+    count = 0
+    for file_descriptor in file_descriptors:
+        try:
+            if os.readlink(f'/proc/self/fd/{file_descriptor}').startswith('socket:'):
+                count += 1
+        except OSError:
+            pass
+    return count
+
+
+def get_peak_rss_mb() -> float:
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss / 1024 ** 2 if os.uname().sysname == 'Darwin' else peak_rss / 1024
+
+
+def create_downloader(base_urls: List[str], directory: str, args: argparse.Namespace) -> XkcdAsyncDownloader:
+    attributes = {
+        'DIRECTORY': directory,
+        'URL_API': f'{base_urls[0]}/{{}}/info.0.json',
+        'CONCURRENCY': args.concurrency,
+        'API_CONCURRENCY': args.api_concurrency,
+        'IMAGE_CONCURRENCY': args.image_concurrency,
+        'RATE_LIMIT': args.rate_limit,
+        'MAX_RATE_LIMIT': args.max_rate_limit,
+        'CPU_EXECUTOR': args.cpu_executor,
+    }
+    if len(base_urls) > 1:
+        attributes['SOURCES'] = tuple(
+            ComicSource(f'stub-{i}', f'{base_url}/{{}}/info.0.json', args.rate_limit, args.max_rate_limit)
+            for i, base_url in enumerate(base_urls)
+        )
+    downloader_class = type('BenchmarkDownloader', (XkcdAsyncDownloader,), attributes)
+    return downloader_class()
+
+
+def run_benchmark(args: argparse.Namespace) -> Dict:
+    config = StubServerConfig(
+        comic_count=args.comics, image_size=args.image_size, latency=args.latency,
+        latency_jitter=args.latency_jitter, error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate, retry_after=args.retry_after, seed=args.seed
+    )
+    port_queue = multiprocessing.Queue()
+    server_processes = [
+        multiprocessing.Process(target=run_stub_server, args=(config, port_queue), daemon=True)
+        for _ in range(args.mirrors + 1)
+    ]
+    for server_process in server_processes:
+        server_process.start()
+    directory = tempfile.mkdtemp(prefix='xkcd-benchmark-')
+    try:
+        base_urls = [port_queue.get(timeout=10) for _ in server_processes]
+        downloader = create_downloader(base_urls, f'{directory}/comics', args)
+        sampler = ResourceSampler()
+        sampler.start()
+        start = time.perf_counter()
+        downloader.make_download(shards=args.shards)
+        elapsed = time.perf_counter() - start
+        sampler.stop()
+
+        server_stats = []
+        for base_url in base_urls:
+            with urllib.request.urlopen(f'{base_url}/_stats') as response:
+                server_stats.append(json.loads(response.read()))
+    finally:
+        for server_process in server_processes:
+            server_process.terminate()
+            server_process.join()
+        if not args.keep:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    saved_files = downloader.get_amout_of_saved_files
+    return {
+        'comics': args.comics,
+        'saved_files': saved_files,
+        'elapsed_seconds': round(elapsed, 3),
+        'comics_per_second': round(saved_files / elapsed, 2),
+        'megabytes_per_second': round(saved_files * args.image_size / 1024 ** 2 / elapsed, 2),
+        'server': server_stats[0],
+        'mirrors': server_stats[1:],
+        'peak_rss_mb': round(get_peak_rss_mb(), 1),
+        'peak_open_sockets': sampler.peak_open_sockets,
+        'client': downloader.metrics.to_dict(),
+    }
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Benchmark XkcdAsyncDownloader against a local stub server')
+    parser.add_argument('--comics', type=int, default=500)
+    parser.add_argument('--image-size', type=int, default=100 * 1024, help='image size in bytes')
+    parser.add_argument('--latency', type=float, default=0.0, help='server latency in seconds')
+    parser.add_argument('--latency-jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of 500 responses')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of 429 responses')
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--concurrency', type=int, default=XkcdAsyncDownloader.CONCURRENCY)
+    parser.add_argument('--api-concurrency', type=int, default=XkcdAsyncDownloader.API_CONCURRENCY)
+    parser.add_argument('--image-concurrency', type=int, default=XkcdAsyncDownloader.IMAGE_CONCURRENCY)
+    parser.add_argument('--shards', type=int, default=XkcdAsyncDownloader.SHARDS, help='worker processes')
+    parser.add_argument('--mirrors', type=int, default=0, help='extra stub servers crawled as mirror sources')
+    parser.add_argument('--cpu-executor', choices=CpuExecutor.KINDS, default=XkcdAsyncDownloader.CPU_EXECUTOR)
+    parser.add_argument('--rate-limit', type=float, default=XkcdAsyncDownloader.RATE_LIMIT)
+    parser.add_argument('--max-rate-limit', type=float, default=XkcdAsyncDownloader.MAX_RATE_LIMIT)
+    parser.add_argument('--keep', action='store_true', help='keep the downloaded files')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    configure_logging(logging.WARNING)
+    report = run_benchmark(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    server = report.pop('server')
+    mirrors = report.pop('mirrors')
+    client = report.pop('client')
+    for key, value in report.items():
+        print(f'{key:>22}: {value}')
+    print(f'{"server_statuses":>22}: {server["statuses"]}')
+    for i, mirror in enumerate(mirrors, start=1):
+        print(f'{"mirror_" + str(i) + "_statuses":>22}: {mirror["statuses"]}')
+    for percentile in ('p50', 'p95', 'p99'):
+        print(f'{"server_latency_" + percentile:>22}: {server["latency_" + percentile] * 1000:.1f}ms')
+    for name, summary in client['histograms'].items():
+        print(f'{name:>22}: p50 {summary["p50"] * 1000:.1f}ms, p99 {summary["p99"] * 1000:.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+import asyncio
+import random
+import time
+
+from collections import Counter
+from typing import Dict, List, NamedTuple
+
+from aiohttp import web
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+FILLER_BLOCK = bytes(range(256)) * 256
+
+
+class StubServerConfig(NamedTuple):
+    comic_count: int = 500
+    image_size: int = 100 * 1024
+    latency: float = 0.0
+    latency_jitter: float = 0.0
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    retry_after: int = 1
+    seed: int = 0
+
+
+def get_percentile(values: List[float], percentile: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[int(round(percentile / 100 * (len(ordered) - 1)))]
+
+
+class XkcdStubServer:
+    def __init__(self, config: StubServerConfig = StubServerConfig()) -> None:
+        self.config = config
+        self.__random = random.Random(config.seed)
+        self.__statuses: Counter = Counter()
+        self.__latencies: List[float] = []
+        self.__runner = None
+
+    @property
+    def stats(self) -> Dict:
+        return {
+            'requests': sum(self.__statuses.values()),
+            'statuses': {str(status): count for status, count in sorted(self.__statuses.items())},
+            'latency_p50': get_percentile(self.__latencies, 50),
+            'latency_p95': get_percentile(self.__latencies, 95),
+            'latency_p99': get_percentile(self.__latencies, 99),
+        }
+
+    def create_app(self) -> web.Application:
+        app = web.Application(middlewares=[self.__fault_middleware])
+        app.router.add_get(r'/{comic_id:\d*}/info.0.json', self.__handle_info)
+        app.router.add_get('/info.0.json', self.__handle_info)
+        app.router.add_get(r'/comics/{comic_id:\d+}.png', self.__handle_image)
+        app.router.add_get('/_stats', self.__handle_stats)
+        return app
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        self.__runner = web.AppRunner(self.create_app())
+        await self.__runner.setup()
+        await web.TCPSite(self.__runner, host, port).start()
+        address = self.__runner.addresses[0]
+        return f'http://{address[0]}:{address[1]}'
+
+    async def stop(self) -> None:
+        if self.__runner:
+            await self.__runner.cleanup()
+            self.__runner = None
+
+    def get_image_content(self, comic_id: int) -> bytes:
+        header = PNG_SIGNATURE + comic_id.to_bytes(4, 'big')
+        size = max(self.config.image_size - len(header), 0)
+        repeats = size // len(FILLER_BLOCK) + 1
+        return header + (FILLER_BLOCK * repeats)[:size]
+
+    @web.middleware
+    async def __fault_middleware(self, request: web.Request, handler) -> web.StreamResponse:
+        if request.path == '/_stats':
+            return await handler(request)
+
+        started = time.monotonic()
+        delay = self.config.latency + self.__random.uniform(0, self.config.latency_jitter)
+        if delay:
+            await asyncio.sleep(delay)
+
+        draw = self.__random.random()
+        if draw < self.config.throttle_rate:
+            response = web.Response(status=429, headers={'Retry-After': str(self.config.retry_after)})
+        elif draw < self.config.throttle_rate + self.config.error_rate:
+            response = web.Response(status=500)
+        else:
+            response = await handler(request)
+
+        self.__statuses[response.status] += 1
+        self.__latencies.append(time.monotonic() - started)
+        return response
+
+    async def __handle_info(self, request: web.Request) -> web.Response:
+        comic_id = int(request.match_info.get('comic_id') or self.config.comic_count)
+        if not 1 <= comic_id <= self.config.comic_count:
+            return web.Response(status=404)
+
+        host = f'{request.scheme}://{request.host}'
+        return web.json_response({
+            'num': comic_id,
+            'title': f'Comic {comic_id}',
+            'safe_title': f'Comic {comic_id}',
+            'img': f'{host}/comics/{comic_id}.png',
+            'alt': f'Alt text of comic {comic_id}',
+            'transcript': '',
+            'year': '2022', 'month': '2', 'day': '9',
+            'link': '', 'news': '',
+        })
+
+    async def __handle_image(self, request: web.Request) -> web.Response:
+        comic_id = int(request.match_info['comic_id'])
+        if not 1 <= comic_id <= self.config.comic_count:
+            return web.Response(status=404)
+        return web.Response(body=self.get_image_content(comic_id), content_type='image/png')
+
+    async def __handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+
+def run_stub_server(config: StubServerConfig, port_queue, host: str = '127.0.0.1') -> None:
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    server = XkcdStubServer(config)
+    port_queue.put(loop.run_until_complete(server.start(host)))
+    try:
+        loop.run_forever()
+    finally:
+        loop.run_until_complete(server.stop())
+        loop.close()
@@ -0,0 +1,103 @@
+import mmap
+import multiprocessing
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import md5
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from src.blob_layout import is_blob_name
+from src.comic_index import ComicIndex
+
+
+class VerifyReport(NamedTuple):
+    checked_files: int
+    corrupt_files: List[str]
+    missing_ids: List[int]
+    corrupt_ids: List[int]
+
+    @property
+    def broken_ids(self) -> List[int]:
+        return sorted(set(self.missing_ids) | set(self.corrupt_ids))
+
+
+def hash_mapped_file(file_path: str) -> Tuple[str, Optional[str]]:
+    try:
+        with open(file_path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return file_path, md5().hexdigest()
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+                return file_path, md5(mapped_file).hexdigest()
+    except OSError:
+        return file_path, None
+
+
+def find_blob_files(directory: str, excluded_directories: Iterable[str] = ()) -> List[str]:
+    blob_files = []
+    for root, directories, file_names in os.walk(directory):
+        directories[:] = [
+            name for name in directories if not name.startswith('.') and name not in excluded_directories
+        ]
+        blob_files.extend(f'{root}/{name}' for name in file_names if is_blob_name(name))
+    return blob_files
+
+
+def hash_files(file_paths: List[str], workers: int) -> List[Tuple[str, Optional[str]]]:
+    if workers <= 1 or len(file_paths) < workers:
+        return [hash_mapped_file(file_path) for file_path in file_paths]
+
+    chunk_size = max(len(file_paths) // (workers * 4), 1)
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        return list(executor.map(hash_mapped_file, file_paths, chunksize=chunk_size))
+
+
+def verify_archive(directory: str, index_file: str = '.index.sqlite3', workers: Optional[int] = None,
+                   excluded_directories: Iterable[str] = ()) -> VerifyReport:
+    file_paths = find_blob_files(directory, excluded_directories)
+    corrupt_files = []
+    valid_blobs = set()
+    corrupt_blobs = set()
+    for file_path, file_hash in hash_files(file_paths, workers or os.cpu_count() or 1):
+        name_hash, extension = os.path.basename(file_path).split('.', 1)
+        if file_hash == name_hash:
+            valid_blobs.add((name_hash, extension))
+        else:
+            corrupt_files.append(file_path)
+            corrupt_blobs.add((name_hash, extension))
+
+    missing_ids: List[int] = []
+    corrupt_ids: List[int] = []
+    index_path = f'{directory}/{index_file}'
+    if os.path.isfile(index_path):
+        index = ComicIndex()
+        index.open(index_path)
+        try:
+            comic_ids_by_blob = index.get_comic_ids_by_blob()
+        finally:
+            index.close()
+        for blob, comic_ids in comic_ids_by_blob.items():
+            if blob in valid_blobs:
+                continue
+            (corrupt_ids if blob in corrupt_blobs else missing_ids).extend(comic_ids)
+
+    return VerifyReport(len(file_paths), sorted(corrupt_files), sorted(missing_ids), sorted(corrupt_ids))
+
+
+def discard_broken_comics(directory: str, report: VerifyReport, index_file: str = '.index.sqlite3') -> None:
+    for file_path in report.corrupt_files:
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+
+    index_path = f'{directory}/{index_file}'
+    if not report.broken_ids or not os.path.isfile(index_path):
+        return
+    index = ComicIndex()
+    index.open(index_path)
+    try:
+        for comic_id in report.broken_ids:
+            index.mark_failed(comic_id)
+    finally:
+        index.close()
@@ -0,0 +1,30 @@
+import re
+
+from typing import NamedTuple, Optional
+
+BLOB_NAME_PATTERN = re.compile(r'^[0-9a-f]{32}\.\w+$')
+LINK_KINDS = ('hardlink', 'symlink')
+
+
+class BlobLayout(NamedTuple):
+    sharded: bool = False
+    levels: int = 2
+    width: int = 2
+    links: Optional[str] = None
+    links_directory: str = 'by-id'
+
+    def get_blob_path(self, file_hash: str, extension: str) -> str:
+        file_name = f'{file_hash}.{extension}'
+        if not self.sharded:
+            return file_name
+        prefixes = [file_hash[level * self.width:(level + 1) * self.width] for level in range(self.levels)]
+        return '/'.join(prefixes + [file_name])
+
+    def get_link_path(self, comic_id: int, extension: str) -> Optional[str]:
+        if not self.links:
+            return None
+        return f'{self.links_directory}/{comic_id}.{extension}'
+
+
+def is_blob_name(file_name: str) -> bool:
+    return bool(BLOB_NAME_PATTERN.match(file_name))
@@ -0,0 +1,102 @@
+import json
+import os
+
+from typing import Callable, Dict, IO, List, NamedTuple, Optional, Set
+
+from src.comic_index import ComicRecord
+
+
+class JournalState(NamedTuple):
+    header: dict
+    metadata: Dict[int, dict]
+    records: Dict[int, ComicRecord]
+    failed: Set[int]
+
+    @property
+    def finished_ids(self) -> Set[int]:
+        return set(self.records) | self.failed
+
+
+class CheckpointJournal:
+    def __init__(self, path: Optional[str] = None, batch_size: int = 100, fsync: bool = False,
+                 before_flush: Optional[Callable[[], None]] = None) -> None:
+        self.path = path
+        self.__batch_size = batch_size
+        self.__fsync = fsync
+        self.__before_flush = before_flush
+        self.__file: Optional[IO] = None
+        self.__pending: List[str] = []
+
+    @property
+    def is_open(self) -> bool:
+        return self.__file is not None
+
+    def open(self, header: dict, resume: bool = False) -> None:
+        if not self.path:
+            return
+        self.__file = open(self.path, 'a' if resume else 'w')
+        if not resume:
+            self.__append({'state': 'run', **header})
+            self.flush()
+
+    def record_metadata(self, comic_id: int, comic_data: dict) -> None:
+        self.__append({'state': 'metadata', 'id': comic_id, 'data': comic_data})
+
+    def record_stored(self, record: ComicRecord) -> None:
+        self.__append({'state': 'stored', 'id': record.comic_id, 'record': list(record)})
+
+    def record_failed(self, comic_id: int) -> None:
+        self.__append({'state': 'failed', 'id': comic_id})
+
+    def flush(self) -> None:
+        if not self.__pending or not self.is_open:
+            return
+        if self.__before_flush:
+            self.__before_flush()
+        pending, self.__pending = self.__pending, []
+        self.__file.write(''.join(pending))
+        self.__file.flush()
+        if self.__fsync:
+            os.fsync(self.__file.fileno())
+
+    def close(self, remove: bool = False) -> None:
+        if not self.is_open:
+            return
+        self.flush()
+        self.__file.close()
+        self.__file = None
+        if remove:
+            os.remove(self.path)
+
+    def __append(self, entry: dict) -> None:
+        if not self.is_open:
+            return
+        self.__pending.append(json.dumps(entry, separators=(',', ':')) + '\n')
+        if len(self.__pending) >= self.__batch_size:
+            self.flush()
+
+
+def load_journal(path: str) -> Optional[JournalState]:
+    try:
+        file = open(path)
+    except FileNotFoundError:
+        return None
+
+    state = JournalState({}, {}, {}, set())
+    with file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            comic_id = entry.get('id')
+            if entry['state'] == 'run':
+                state.header.update(entry)
+            elif entry['state'] == 'metadata':
+                state.metadata[comic_id] = entry['data']
+            elif entry['state'] == 'stored':
+                state.records[comic_id] = ComicRecord(*entry['record'])
+                state.failed.discard(comic_id)
+            elif entry['state'] == 'failed':
+                state.failed.add(comic_id)
+    return state if state.header else None
@@ -0,0 +1,230 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+from typing import List, Optional
+
+from src.blob_layout import LINK_KINDS, BlobLayout
+from src.comic_index import ComicIndex
+from src.defaults import DEFAULT_DIRECTORY, DEFAULT_URL_API, INDEX_FILE, JOURNAL_FILE, METADATA_DIRECTORY
+from src.logging_config import configure_logging
+
+# Heavy modules (the downloader with aiohttp, the verifier with its process pool) are only imported by the
+# commands that need them.
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR')
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    default_layout = BlobLayout()
+    parser = argparse.ArgumentParser(description='Download xkcd comic images into a local directory')
+    parser.add_argument('--directory', default=DEFAULT_DIRECTORY)
+    parser.add_argument('--url-api', default=DEFAULT_URL_API, help='comic JSON URL with a {} for the id')
+    parser.add_argument('--mirror', action='append', default=[], help='JSON URL of a mirror (repeatable)')
+    parser.add_argument('--first', type=int, help='first comic id of the range')
+    parser.add_argument('--last', type=int, help='last comic id of the range (default: latest comic)')
+
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--only-new', action='store_true', help='fetch comics after the last crawled id')
+    mode.add_argument('--retry-failed', action='store_true', help='fetch only comics that failed before')
+    mode.add_argument('--refresh', action='store_true', help='revalidate indexed comics')
+    mode.add_argument('--resume', action='store_true', help='continue an interrupted run from its journal')
+
+    action = parser.add_mutually_exclusive_group()
+    action.add_argument('--dry-run', action='store_true', help='list the comics that would be fetched')
+    action.add_argument('--status', action='store_true', help='show the state of the local index')
+    action.add_argument('--verify', action='store_true', help='re-hash files and compare with the index')
+    action.add_argument('--repair', action='store_true', help='verify and re-fetch broken or missing comics')
+
+    parser.add_argument('--concurrency', type=int, help='concurrent requests of each pipeline stage')
+    parser.add_argument('--shards', type=int, help='worker processes')
+    parser.add_argument('--timeout', type=float, help='total timeout of each request in seconds')
+    parser.add_argument('--workers', type=int, help='processes used to hash files (default: CPU count)')
+    parser.add_argument('--sharded-layout', action='store_true', help='images are in the sharded blob layout')
+    parser.add_argument('--levels', type=int, default=default_layout.levels)
+    parser.add_argument('--width', type=int, default=default_layout.width)
+    parser.add_argument('--links', choices=LINK_KINDS, help='create a link per comic id')
+    parser.add_argument('--links-directory', default=default_layout.links_directory)
+    parser.add_argument('--json', action='store_true', help='print status and dry-run reports as JSON')
+    parser.add_argument('--log-level', choices=LOG_LEVELS, default='INFO')
+    args = parser.parse_args(argv)
+    if (args.first or args.last) and (args.shards or args.resume):
+        parser.error('--first/--last cannot be combined with --shards or --resume')
+    return args
+
+
+def open_index(directory: str) -> Optional[ComicIndex]:
+    index_path = f'{directory}/{INDEX_FILE}'
+    if not os.path.isfile(index_path):
+        return None
+    index = ComicIndex()
+    index.open(index_path)
+    return index
+
+
+def get_status(directory: str) -> dict:
+    status = {
+        'directory': directory, 'indexed_comics': 0, 'failed_comics': 0, 'last_crawled_id': 0,
+        'interrupted_run': os.path.isfile(f'{directory}/{JOURNAL_FILE}'),
+    }
+    index = open_index(directory)
+    if index is None:
+        return status
+    try:
+        status['indexed_comics'] = len(index.completed_ids())
+        status['failed_comics'] = len(index.failed_ids())
+        status['last_crawled_id'] = index.get_last_crawled_id()
+    finally:
+        index.close()
+    return status
+
+
+def get_latest_comic_id(url_api: str, timeout: Optional[float] = None) -> int:
+    import urllib.request
+
+    with urllib.request.urlopen(url_api.format(''), timeout=timeout or 30) as response:
+        return json.loads(response.read())['num']
+
+
+def plan_comic_ids(args: argparse.Namespace) -> List[int]:
+    last_id = args.last or get_latest_comic_id(args.url_api, args.timeout)
+    comic_ids = range(args.first or 1, last_id + 1)
+    index = open_index(args.directory)
+    if index is None:
+        return [] if args.retry_failed else list(comic_ids)
+
+    try:
+        if args.retry_failed:
+            return [i for i in index.failed_ids() if i in comic_ids]
+        if args.refresh:
+            return list(comic_ids)
+        if args.only_new:
+            last_crawled_id = index.get_last_crawled_id()
+            failed_ids = set(index.failed_ids())
+            return [i for i in comic_ids if i > last_crawled_id or i in failed_ids]
+        completed_ids = index.completed_ids()
+        return [i for i in comic_ids if i not in completed_ids]
+    finally:
+        index.close()
+
+
+def get_blob_layout(args: argparse.Namespace) -> BlobLayout:
+    return BlobLayout(args.sharded_layout, args.levels, args.width, args.links, args.links_directory)
+
+
+def print_report(report: dict, as_json: bool) -> None:
+    if as_json:
+        print(json.dumps(report, indent=2))
+        return
+    for key, value in report.items():
+        print(f'{key:>16}: {value}')
+
+
+def create_downloader(args: argparse.Namespace):
+    from src.xkcd_async_downloader import XkcdAsyncDownloader
+
+    from src.comic_source import ComicSource
+
+    attributes = {
+        'DIRECTORY': args.directory, 'URL_API': args.url_api, 'BLOB_LAYOUT': get_blob_layout(args)
+    }
+    profile = XkcdAsyncDownloader.CONNECTOR_PROFILE
+    if args.concurrency:
+        # Both stages share the rate limiter and the connector pool, while each stage talks to its own host.
+        attributes.update(
+            API_CONCURRENCY=args.concurrency, IMAGE_CONCURRENCY=args.concurrency,
+            CONCURRENCY=args.concurrency * 2
+        )
+        profile = profile._replace(limit=args.concurrency * 2, limit_per_host=args.concurrency)
+    if args.timeout:
+        profile = profile._replace(total_timeout=args.timeout)
+    if profile != XkcdAsyncDownloader.CONNECTOR_PROFILE:
+        attributes['CONNECTOR_PROFILE'] = profile
+    if args.mirror:
+        urls = [args.url_api] + args.mirror
+        attributes['SOURCES'] = tuple(
+            ComicSource(f'mirror-{i}' if i else 'xkcd', url, XkcdAsyncDownloader.RATE_LIMIT,
+                        XkcdAsyncDownloader.MAX_RATE_LIMIT, profile)
+            for i, url in enumerate(urls)
+        )
+    return type('CliDownloader', (XkcdAsyncDownloader,), attributes)()
+
+
+def run_download(args: argparse.Namespace) -> None:
+    logging_handle = configure_logging(getattr(logging, args.log_level), use_queue=True)
+    start = time.perf_counter()
+    try:
+        instance = create_downloader(args)
+        if args.first or args.last:
+            instance.download_comics(plan_comic_ids(args), refresh=args.refresh)
+        else:
+            instance.make_download(
+                incremental=args.only_new, refresh=args.refresh, retry_failed=args.retry_failed,
+                shards=args.shards, resume=args.resume
+            )
+    finally:
+        logging_handle.stop()
+    print('End of execution!')
+    print(f'Resume: {instance.get_amout_of_saved_files}'
+          ' comics image files has been downloaded and saved '
+          f'in {instance.DIRECTORY}/')
+    print('Execution time: {:.2f}s'.format(time.perf_counter() - start))
+
+
+def run_verify(args: argparse.Namespace) -> int:
+    from src.archive_verifier import discard_broken_comics, verify_archive
+
+    excluded_directories = (args.links_directory, METADATA_DIRECTORY)
+    report = verify_archive(args.directory, INDEX_FILE, args.workers, excluded_directories)
+    summary = {
+        'checked_files': report.checked_files, 'corrupt_files': len(report.corrupt_files),
+        'missing_comics': report.missing_ids, 'corrupt_comics': report.corrupt_ids,
+    }
+    if not args.repair:
+        print_report(summary, args.json)
+        return 1 if report.broken_ids or report.corrupt_files else 0
+
+    discard_broken_comics(args.directory, report, INDEX_FILE)
+    if not report.broken_ids:
+        print_report(summary, args.json)
+        return 0
+
+    logging_handle = configure_logging(getattr(logging, args.log_level), use_queue=True)
+    try:
+        create_downloader(args).download_comics(report.broken_ids)
+    finally:
+        logging_handle.stop()
+    broken_ids = set(report.broken_ids)
+    index = open_index(args.directory)
+    try:
+        summary['unrepaired_comics'] = [i for i in index.failed_ids() if i in broken_ids]
+    finally:
+        index.close()
+    print_report(summary, args.json)
+    return 1 if summary['unrepaired_comics'] else 0
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.status:
+        print_report(get_status(args.directory), args.json)
+        return 0
+
+    if args.dry_run:
+        comic_ids = plan_comic_ids(args)
+        report = {'comics': len(comic_ids), 'first_id': min(comic_ids, default=None),
+                  'last_id': max(comic_ids, default=None)}
+        print_report(report, args.json)
+        return 0
+
+    if args.verify or args.repair:
+        return run_verify(args)
+
+    run_download(args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
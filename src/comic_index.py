@@ -0,0 +1,147 @@
+import sqlite3
+
+from collections import defaultdict
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+
+class ComicRecord(NamedTuple):
+    comic_id: int
+    image_url: str
+    md5: str
+    extension: str
+    size: int
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    api_etag: Optional[str] = None
+    api_last_modified: Optional[str] = None
+
+
+class ComicResult(NamedTuple):
+    comic_id: int
+    status: str
+    record: Optional[ComicRecord] = None
+
+
+class ComicIndex:
+    COMMIT_INTERVAL: int = 100
+    VALIDATOR_COLUMNS = ('last_modified', 'api_etag', 'api_last_modified')
+
+    def __init__(self) -> None:
+        self.__connection = None
+        self.__pending_writes = 0
+
+    @property
+    def is_open(self) -> bool:
+        return self.__connection is not None
+
+    def open(self, path: str) -> None:
+        self.__connection = sqlite3.connect(path)
+        self.__connection.execute(
+            'CREATE TABLE IF NOT EXISTS comics ('
+            'comic_id INTEGER PRIMARY KEY, image_url TEXT NOT NULL, md5 TEXT NOT NULL, '
+            'extension TEXT NOT NULL, size INTEGER NOT NULL, etag TEXT)'
+        )
+        columns = {row[1] for row in self.__connection.execute('PRAGMA table_info(comics)')}
+        for column in self.VALIDATOR_COLUMNS:
+            if column not in columns:
+                self.__connection.execute(f'ALTER TABLE comics ADD COLUMN {column} TEXT')
+        self.__connection.execute('CREATE TABLE IF NOT EXISTS failed_comics (comic_id INTEGER PRIMARY KEY)')
+        self.__connection.execute(
+            'CREATE TABLE IF NOT EXISTS crawl_state (key TEXT PRIMARY KEY, value INTEGER NOT NULL)'
+        )
+        self.__connection.commit()
+
+    def close(self) -> None:
+        if not self.is_open:
+            return
+        self.__connection.commit()
+        self.__connection.close()
+        self.__connection = None
+        self.__pending_writes = 0
+
+    def commit(self) -> None:
+        self.__connection.commit()
+        self.__pending_writes = 0
+
+    def add(self, record: ComicRecord) -> None:
+        self.__connection.execute(
+            'INSERT OR REPLACE INTO comics (comic_id, image_url, md5, extension, size, etag, '
+            'last_modified, api_etag, api_last_modified) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', record
+        )
+        self.__connection.execute('DELETE FROM failed_comics WHERE comic_id = ?', (record.comic_id,))
+        self.__register_write()
+
+    def add_failed(self, comic_id: int) -> None:
+        self.__connection.execute('INSERT OR IGNORE INTO failed_comics (comic_id) VALUES (?)', (comic_id,))
+        self.__register_write()
+
+    def mark_failed(self, comic_id: int) -> None:
+        self.__connection.execute('DELETE FROM comics WHERE comic_id = ?', (comic_id,))
+        self.add_failed(comic_id)
+
+    def merge(self, path: str) -> None:
+        self.__connection.commit()
+        self.__connection.execute('ATTACH DATABASE ? AS shard', (path,))
+        try:
+            self.__connection.execute(
+                'INSERT OR REPLACE INTO comics (comic_id, image_url, md5, extension, size, etag, '
+                'last_modified, api_etag, api_last_modified) SELECT comic_id, image_url, md5, extension, '
+                'size, etag, last_modified, api_etag, api_last_modified FROM shard.comics'
+            )
+            self.__connection.execute(
+                'DELETE FROM failed_comics WHERE comic_id IN (SELECT comic_id FROM shard.comics)'
+            )
+            self.__connection.execute(
+                'INSERT OR IGNORE INTO failed_comics (comic_id) SELECT comic_id FROM shard.failed_comics'
+            )
+            self.__connection.commit()
+        finally:
+            self.__connection.execute('DETACH DATABASE shard')
+
+    def get(self, comic_id: int) -> Optional[ComicRecord]:
+        row = self.__connection.execute(
+            'SELECT comic_id, image_url, md5, extension, size, etag, last_modified, api_etag, '
+            'api_last_modified FROM comics WHERE comic_id = ?',
+            (comic_id,)
+        ).fetchone()
+        return ComicRecord(*row) if row else None
+
+    def records(self) -> Iterator[ComicRecord]:
+        rows = self.__connection.execute(
+            'SELECT comic_id, image_url, md5, extension, size, etag, last_modified, api_etag, '
+            'api_last_modified FROM comics ORDER BY comic_id'
+        )
+        return (ComicRecord(*row) for row in rows)
+
+    def get_comic_ids_by_blob(self) -> Dict[Tuple[str, str], List[int]]:
+        comic_ids_by_blob: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+        rows = self.__connection.execute('SELECT md5, extension, comic_id FROM comics ORDER BY comic_id')
+        for file_hash, extension, comic_id in rows:
+            comic_ids_by_blob[(file_hash, extension)].append(comic_id)
+        return dict(comic_ids_by_blob)
+
+    def completed_ids(self) -> Set[int]:
+        return {row[0] for row in self.__connection.execute('SELECT comic_id FROM comics')}
+
+    def failed_ids(self) -> List[int]:
+        rows = self.__connection.execute('SELECT comic_id FROM failed_comics ORDER BY comic_id')
+        return [row[0] for row in rows]
+
+    def get_last_crawled_id(self) -> int:
+        row = self.__connection.execute(
+            "SELECT value FROM crawl_state WHERE key = 'last_crawled_id'"
+        ).fetchone()
+        return row[0] if row else 0
+
+    def set_last_crawled_id(self, comic_id: int) -> None:
+        self.__connection.execute(
+            "INSERT OR REPLACE INTO crawl_state (key, value) VALUES ('last_crawled_id', ?)", (comic_id,)
+        )
+        self.__connection.commit()
+        self.__pending_writes = 0
+
+    def __register_write(self) -> None:
+        self.__pending_writes += 1
+        if self.__pending_writes >= self.COMMIT_INTERVAL:
+            self.__connection.commit()
+            self.__pending_writes = 0
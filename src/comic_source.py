@@ -0,0 +1,53 @@
+from typing import Collection, List, NamedTuple, Optional
+
+from src.connector_profile import ConnectorProfile
+from src.rate_limiter import AdaptiveRateLimiter, RateLimitedSession
+
+
+class ComicSource(NamedTuple):
+    name: str = 'xkcd'
+    url_api: str = 'https://xkcd.com/{}/info.0.json'
+    rate_limit: float = 20.0
+    max_rate_limit: float = 100.0
+    connector_profile: ConnectorProfile = ConnectorProfile()
+
+    def get_latest_url(self) -> str:
+        return self.url_api.format('')
+
+    def get_metadata_url(self, comic_id: int) -> str:
+        return self.url_api.format(comic_id)
+
+    def parse_latest_id(self, content: dict) -> int:
+        return content['num']
+
+    def parse_image_url(self, content: dict) -> str:
+        return content['img']
+
+
+class SourceClient(NamedTuple):
+    source: ComicSource
+    session: RateLimitedSession
+    rate_limiter: AdaptiveRateLimiter
+
+    @property
+    def load(self) -> float:
+        return self.rate_limiter.in_flight / self.rate_limiter.limit
+
+
+class SourcePool:
+    def __init__(self, clients: List[SourceClient]) -> None:
+        self.__clients = clients
+
+    @property
+    def clients(self) -> List[SourceClient]:
+        return list(self.__clients)
+
+    def select(self, excluded: Collection[str] = ()) -> Optional[SourceClient]:
+        candidates = [client for client in self.__clients if client.source.name not in excluded]
+        return min(candidates, key=lambda client: client.load, default=None)
+
+    def get(self, name: Optional[str] = None) -> SourceClient:
+        for client in self.__clients:
+            if client.source.name == name:
+                return client
+        return self.__clients[0]
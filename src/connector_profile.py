@@ -0,0 +1,35 @@
+from typing import NamedTuple, Optional
+
+import aiohttp
+
+
+class ConnectorProfile(NamedTuple):
+    limit: int = 20
+    limit_per_host: int = 10
+    keepalive_timeout: float = 30.0
+    use_dns_cache: bool = True
+    ttl_dns_cache: Optional[int] = 300
+    connect_timeout: Optional[float] = 10.0
+    sock_read_timeout: Optional[float] = 30.0
+    total_timeout: Optional[float] = None
+    compress_api: bool = True
+
+    def create_connector(self) -> aiohttp.TCPConnector:
+        return aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            use_dns_cache=self.use_dns_cache,
+            ttl_dns_cache=self.ttl_dns_cache,
+        )
+
+    def create_timeout(self) -> aiohttp.ClientTimeout:
+        return aiohttp.ClientTimeout(
+            total=self.total_timeout, connect=self.connect_timeout, sock_read=self.sock_read_timeout
+        )
+
+    def get_api_headers(self) -> dict:
+        return {'Accept-Encoding': 'gzip, deflate' if self.compress_api else 'identity'}
+
+    def get_image_headers(self) -> dict:
+        return {'Accept-Encoding': 'identity'}
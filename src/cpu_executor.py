@@ -0,0 +1,54 @@
+import asyncio
+import multiprocessing
+
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from hashlib import md5
+from typing import Any, Callable, Optional
+
+
+def hash_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    file_hash = md5()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+class CpuExecutor:
+    KINDS = ('inline', 'thread', 'process')
+
+    def __init__(self, kind: str = 'thread', workers: int = 2, min_offload_size: int = 0) -> None:
+        if kind not in self.KINDS:
+            raise ValueError(f'Unknown CPU executor kind: {kind}')
+        self.__kind = kind
+        self.__workers = workers
+        self.__min_offload_size = min_offload_size
+        self.__executor: Optional[Executor] = None
+
+    @property
+    def kind(self) -> str:
+        return self.__kind
+
+    @property
+    def shares_memory(self) -> bool:
+        return self.__kind != 'process'
+
+    async def run(self, func: Callable, *args: Any, size: Optional[int] = None) -> Any:
+        if self.__kind == 'inline' or (size is not None and size < self.__min_offload_size):
+            return func(*args)
+        return await asyncio.get_event_loop().run_in_executor(self.__get_executor(), func, *args)
+
+    def close(self) -> None:
+        if self.__executor:
+            self.__executor.shutdown(wait=True)
+            self.__executor = None
+
+    def __get_executor(self) -> Executor:
+        if self.__executor is None:
+            if self.__kind == 'process':
+                self.__executor = ProcessPoolExecutor(
+                    max_workers=self.__workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            else:
+                self.__executor = ThreadPoolExecutor(max_workers=self.__workers, thread_name_prefix='cpu')
+        return self.__executor
@@ -0,0 +1,8 @@
+# Default settings shared by XkcdAsyncDownloader and the CLI. Only constants live here, so the CLI can read
+# them without importing the downloader and aiohttp.
+DEFAULT_DIRECTORY = 'comics-xkcd'
+DEFAULT_URL_API = 'https://xkcd.com/{}/info.0.json'
+INDEX_FILE = '.index.sqlite3'
+JOURNAL_FILE = '.journal.ndjson'
+METADATA_DIRECTORY = 'metadata'
+METADATA_FILE = f'{METADATA_DIRECTORY}/comics.ndjson'
@@ -0,0 +1,161 @@
+import asyncio
+import errno
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, BinaryIO, Iterable, List, Optional, Set
+
+
+def replace_link(file_path: str, link_path: str, kind: str = 'hardlink') -> None:
+    link_directory = os.path.dirname(link_path) or '.'
+    target = os.path.relpath(file_path, link_directory)
+    if kind == 'symlink' and os.path.islink(link_path) and os.readlink(link_path) == target:
+        return
+    if kind != 'symlink' and os.path.isfile(link_path) and not os.path.islink(link_path) \
+            and os.path.samefile(file_path, link_path):
+        return
+
+    os.makedirs(link_directory, exist_ok=True)
+    temp_link_path = f'{link_directory}/.{os.path.basename(link_path)}.link'
+    if os.path.lexists(temp_link_path):
+        os.remove(temp_link_path)
+    if kind == 'symlink':
+        os.symlink(target, temp_link_path)
+    else:
+        os.link(file_path, temp_link_path)
+    os.replace(temp_link_path, link_path)
+
+
+class StorageWriter:
+    def __init__(self, file: BinaryIO, executor: ThreadPoolExecutor) -> None:
+        self.__file = file
+        self.__executor = executor
+
+    async def write(self, data: bytes) -> None:
+        await asyncio.get_event_loop().run_in_executor(self.__executor, self.__file.write, data)
+
+
+class LocalStorage:
+    def __init__(self, write_workers: int = 4, fsync_batch_size: int = 0) -> None:
+        self.__write_workers = write_workers
+        self.__fsync_batch_size = fsync_batch_size
+        self.__executor: Optional[ThreadPoolExecutor] = None
+        self.__existing_files: Set[str] = set()
+        self.__pending_fsync: List[str] = []
+
+    @property
+    def amount_of_files(self) -> int:
+        return len(self.__existing_files)
+
+    def scan(self, directory: str, excluded_directories: Iterable[str] = ()) -> None:
+        self.__existing_files = set()
+        for root, directories, file_names in os.walk(directory):
+            directories[:] = [
+                name for name in directories if not name.startswith('.') and name not in excluded_directories
+            ]
+            self.__existing_files.update(
+                f'{root}/{name}' for name in file_names if not name.startswith('.')
+            )
+
+    def exists(self, file_path: str) -> bool:
+        return file_path in self.__existing_files
+
+    @asynccontextmanager
+    async def open_for_write(self, file_path: str) -> AsyncIterator[StorageWriter]:
+        loop = asyncio.get_event_loop()
+        executor = self.__get_executor()
+        file = await loop.run_in_executor(executor, open, file_path, 'wb')
+        try:
+            yield StorageWriter(file, executor)
+        finally:
+            await loop.run_in_executor(executor, file.close)
+
+    async def commit(self, temp_path: str, file_path: str) -> bool:
+        if self.exists(file_path):
+            await self.remove(temp_path)
+            return False
+
+        self.__existing_files.add(file_path)
+        try:
+            moved = await self.__run(self.__move_without_overwrite, temp_path, file_path)
+        except Exception:
+            self.__existing_files.discard(file_path)
+            raise
+
+        if not moved:
+            return False
+
+        if self.__fsync_batch_size:
+            self.__pending_fsync.append(file_path)
+            if len(self.__pending_fsync) >= self.__fsync_batch_size:
+                await self.flush()
+        return True
+
+    async def link(self, file_path: str, link_path: str, kind: str = 'hardlink') -> None:
+        await self.__run(replace_link, file_path, link_path, kind)
+
+    async def remove(self, file_path: str) -> None:
+        await self.__run(self.__remove_file, file_path)
+
+    async def flush(self) -> None:
+        pending_fsync, self.__pending_fsync = self.__pending_fsync, []
+        if pending_fsync:
+            await self.__run(self.__fsync_files, pending_fsync)
+
+    async def close(self) -> None:
+        await self.flush()
+        if self.__executor:
+            self.__executor.shutdown(wait=True)
+            self.__executor = None
+
+    async def __run(self, func, *args):
+        return await asyncio.get_event_loop().run_in_executor(self.__get_executor(), func, *args)
+
+    def __get_executor(self) -> ThreadPoolExecutor:
+        if self.__executor is None:
+            self.__executor = ThreadPoolExecutor(
+                max_workers=self.__write_workers, thread_name_prefix='local-storage'
+            )
+        return self.__executor
+
+    @staticmethod
+    def __move_without_overwrite(temp_path: str, file_path: str) -> bool:
+        os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+        try:
+            os.link(temp_path, file_path)
+        except FileExistsError:
+            os.remove(temp_path)
+            return False
+        except OSError as e:
+            if e.errno not in (errno.ENOTSUP, errno.EOPNOTSUPP, errno.EMLINK):
+                raise
+            os.replace(temp_path, file_path)
+            return True
+        os.remove(temp_path)
+        return True
+
+    @staticmethod
+    def __remove_file(file_path: str) -> None:
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def __fsync_files(file_paths: List[str]) -> None:
+        directories = set()
+        for file_path in file_paths:
+            fd = os.open(file_path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            directories.add(os.path.dirname(file_path) or '.')
+
+        for directory in directories:
+            fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
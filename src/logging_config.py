@@ -0,0 +1,37 @@
+import logging
+import queue
+
+from logging.handlers import QueueHandler, QueueListener
+from typing import IO, Optional
+
+LOG_FORMAT = '[%(asctime)s][%(levelname)s] %(message)s'
+
+
+class LoggingHandle:
+    def __init__(self, handler: logging.Handler, listener: Optional[QueueListener] = None) -> None:
+        self.__handler = handler
+        self.__listener = listener
+
+    def stop(self) -> None:
+        logging.getLogger().removeHandler(self.__handler)
+        if self.__listener:
+            self.__listener.stop()
+            self.__listener = None
+
+
+def configure_logging(level: int = logging.INFO, use_queue: bool = False,
+                      stream: Optional[IO] = None) -> LoggingHandle:
+    stream_handler = logging.StreamHandler(stream)
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root_logger = logging.getLogger()
+    root_logger.setLevel(level)
+    if not use_queue:
+        root_logger.addHandler(stream_handler)
+        return LoggingHandle(stream_handler)
+
+    log_queue: queue.Queue = queue.Queue(-1)
+    queue_handler = QueueHandler(log_queue)
+    root_logger.addHandler(queue_handler)
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    return LoggingHandle(queue_handler, listener)
@@ -0,0 +1,26 @@
+import asyncio
+import time
+
+from src.metrics import Metrics
+
+
+class LoopLagMonitor:
+    def __init__(self, metrics: Metrics, interval: float = 0.1, name: str = 'event_loop_lag_seconds') -> None:
+        self.__metrics = metrics
+        self.__interval = interval
+        self.__name = name
+        self.__task = None
+
+    def start(self) -> None:
+        self.__task = asyncio.ensure_future(self.__measure())
+
+    def stop(self) -> None:
+        if self.__task:
+            self.__task.cancel()
+            self.__task = None
+
+    async def __measure(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.__interval)
+            self.__metrics.observe(self.__name, max(time.perf_counter() - started - self.__interval, 0.0))
@@ -0,0 +1,74 @@
+import gzip
+import json
+import os
+import shutil
+
+from typing import IO, Iterator, List, Optional
+
+
+def open_metadata_file(path: str, mode: str) -> IO:
+    if path.endswith('.gz'):
+        return gzip.open(path, f'{mode}t', compresslevel=6, encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+class MetadataWriter:
+    def __init__(self, path: Optional[str] = None, batch_size: int = 100) -> None:
+        self.path = path
+        self.__batch_size = batch_size
+        self.__pending: List[str] = []
+        self.__written = 0
+
+    @property
+    def written(self) -> int:
+        return self.__written
+
+    def write(self, metadata: dict) -> None:
+        if not self.path:
+            return
+        self.__pending.append(json.dumps(metadata, ensure_ascii=False, separators=(',', ':')) + '\n')
+        if len(self.__pending) >= self.__batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.__pending:
+            return
+        pending, self.__pending = self.__pending, []
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open_metadata_file(self.path, 'a') as file:
+            file.write(''.join(pending))
+        self.__written += len(pending)
+
+
+def iter_metadata(path: str, latest_only: bool = True) -> Iterator[dict]:
+    if not latest_only:
+        yield from iter_metadata_lines(path)
+        return
+
+    # Re-fetched comics are appended again, so a first pass finds the last line of each comic; only line
+    # numbers are kept in memory, not the records.
+    last_lines = {}
+    for line_number, comic in enumerate(iter_metadata_lines(path)):
+        last_lines[comic.get('num', -line_number - 1)] = line_number
+    latest_lines = set(last_lines.values())
+    for line_number, comic in enumerate(iter_metadata_lines(path)):
+        if line_number in latest_lines:
+            yield comic
+
+
+def iter_metadata_lines(path: str) -> Iterator[dict]:
+    with open_metadata_file(path, 'r') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                return
+
+
+def append_metadata_file(source_path: str, target_path: str) -> None:
+    os.makedirs(os.path.dirname(target_path) or '.', exist_ok=True)
+    with open(source_path, 'rb') as source, open(target_path, 'ab') as target:
+        shutil.copyfileobj(source, target)
+    os.remove(source_path)
@@ -0,0 +1,162 @@
+import json
+import os
+
+from bisect import bisect_left
+from collections import defaultdict, deque
+from typing import Callable, Deque, Dict, List, Tuple
+
+LabelsKey = Tuple[Tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def format_labels(labels: LabelsKey) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, reservoir_size: int = 10000) -> None:
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.__samples: Deque[float] = deque(maxlen=reservoir_size)
+
+    def observe(self, value: float) -> None:
+        self.bucket_counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.__samples.append(value)
+
+    def snapshot(self) -> dict:
+        return {
+            'bucket_counts': list(self.bucket_counts), 'count': self.count, 'sum': self.sum,
+            'samples': list(self.__samples),
+        }
+
+    def merge(self, snapshot: dict) -> None:
+        self.bucket_counts = [a + b for a, b in zip(self.bucket_counts, snapshot['bucket_counts'])]
+        self.count += snapshot['count']
+        self.sum += snapshot['sum']
+        self.__samples.extend(snapshot['samples'])
+
+    def get_percentile(self, percentile: float) -> float:
+        if not self.__samples:
+            return 0.0
+        ordered = sorted(self.__samples)
+        return ordered[int(round(percentile / 100 * (len(ordered) - 1)))]
+
+    def summary(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'p50': round(self.get_percentile(50), 6),
+            'p95': round(self.get_percentile(95), 6),
+            'p99': round(self.get_percentile(99), 6),
+        }
+
+
+class Metrics:
+    def __init__(self, prefix: str = 'xkcd_downloader') -> None:
+        self.__prefix = prefix
+        self.__counters: Dict[str, Dict[LabelsKey, float]] = defaultdict(lambda: defaultdict(float))
+        self.__histograms: Dict[str, Histogram] = {}
+        self.__gauges: Dict[str, Dict[LabelsKey, Callable[[], float]]] = defaultdict(dict)
+
+    def increment(self, name: str, value: float = 1, **labels: str) -> None:
+        self.__counters[name][tuple(sorted(labels.items()))] += value
+
+    def observe(self, name: str, value: float) -> None:
+        if name not in self.__histograms:
+            self.__histograms[name] = Histogram()
+        self.__histograms[name].observe(value)
+
+    def register_gauge(self, name: str, callback: Callable[[], float], **labels: str) -> None:
+        self.__gauges[name][tuple(sorted(labels.items()))] = callback
+
+    def remove_gauge(self, name: str) -> None:
+        self.__gauges.pop(name, None)
+
+    def get_counter(self, name: str, **labels: str) -> float:
+        if name not in self.__counters:
+            return 0
+        return self.__counters[name].get(tuple(sorted(labels.items())), 0)
+
+    def get_counter_total(self, name: str) -> float:
+        return sum(self.__counters[name].values()) if name in self.__counters else 0
+
+    def get_histogram(self, name: str) -> Histogram:
+        return self.__histograms.get(name) or Histogram()
+
+    def snapshot(self) -> dict:
+        return {
+            'counters': {name: list(series.items()) for name, series in self.__counters.items()},
+            'histograms': {name: histogram.snapshot() for name, histogram in self.__histograms.items()},
+        }
+
+    def merge(self, snapshot: dict) -> None:
+        for name, series in snapshot['counters'].items():
+            for labels, value in series:
+                self.__counters[name][labels] += value
+        for name, histogram in snapshot['histograms'].items():
+            if name not in self.__histograms:
+                self.__histograms[name] = Histogram()
+            self.__histograms[name].merge(histogram)
+
+    def to_dict(self) -> dict:
+        return {
+            'counters': {
+                name: {format_labels(labels) or 'total': value for labels, value in sorted(series.items())}
+                for name, series in sorted(self.__counters.items())
+            },
+            'histograms': {
+                name: histogram.summary() for name, histogram in sorted(self.__histograms.items())
+            },
+            'gauges': {
+                name: self.__get_gauge_values(series) for name, series in sorted(self.__gauges.items())
+            },
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self) -> str:
+        lines: List[str] = []
+        for name, series in sorted(self.__counters.items()):
+            metric_name = f'{self.__prefix}_{name}'
+            lines.append(f'# TYPE {metric_name} counter')
+            for labels, value in sorted(series.items()):
+                lines.append(f'{metric_name}{format_labels(labels)} {value}')
+
+        for name, histogram in sorted(self.__histograms.items()):
+            metric_name = f'{self.__prefix}_{name}'
+            lines.append(f'# TYPE {metric_name} histogram')
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                cumulative += count
+                lines.append(f'{metric_name}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'{metric_name}_bucket{{le="+Inf"}} {histogram.count}')
+            lines.append(f'{metric_name}_sum {histogram.sum}')
+            lines.append(f'{metric_name}_count {histogram.count}')
+
+        for name, series in sorted(self.__gauges.items()):
+            metric_name = f'{self.__prefix}_{name}'
+            lines.append(f'# TYPE {metric_name} gauge')
+            for labels, callback in sorted(series.items()):
+                lines.append(f'{metric_name}{format_labels(labels)} {callback()}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def __get_gauge_values(series: Dict[LabelsKey, Callable[[], float]]):
+        if list(series) == [()]:
+            return series[()]()
+        return {format_labels(labels): callback() for labels, callback in sorted(series.items())}
+
+
+def write_text_atomically(file_path: str, text: str) -> None:
+    temp_path = f'{file_path}.tmp'
+    with open(temp_path, 'w') as file:
+        file.write(text)
+    os.replace(temp_path, file_path)
@@ -0,0 +1,168 @@
+import asyncio
+import time
+
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, List, Optional, Tuple, Union
+
+import aiohttp
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.__tokens = capacity
+        self.__updated = time.monotonic()
+
+    async def take(self) -> None:
+        while True:
+            now = time.monotonic()
+            self.__tokens = min(self.capacity, self.__tokens + (now - self.__updated) * self.rate)
+            self.__updated = now
+            if self.__tokens >= 1:
+                self.__tokens -= 1
+                return
+            await asyncio.sleep((1 - self.__tokens) / self.rate)
+
+
+class AdaptiveRateLimiter:
+    THROTTLE_STATUSES = (429, 503)
+
+    def __init__(self, rate: float, max_rate: float, limit: int, max_limit: int, min_rate: float = 1.0,
+                 min_limit: int = 1, rate_step: float = 5.0, decrease_factor: float = 0.5,
+                 window_size: int = 20, latency_tolerance: float = 2.0) -> None:
+        self.__bucket = TokenBucket(rate, capacity=max(rate, 1.0))
+        self.__max_rate = max_rate
+        self.__min_rate = min_rate
+        self.__rate_step = rate_step
+        self.__limit = limit
+        self.__max_limit = max_limit
+        self.__min_limit = min_limit
+        self.__decrease_factor = decrease_factor
+        self.__window_size = window_size
+        self.__latency_tolerance = latency_tolerance
+        self.__latencies: Deque[float] = deque(maxlen=window_size)
+        self.__samples_since_adjust = 0
+        self.__baseline_p95: Optional[float] = None
+        self.__responses_since_decrease = window_size
+        self.__in_flight = 0
+        self.__waiters: List[asyncio.Future] = []
+
+    @property
+    def rate(self) -> float:
+        return self.__bucket.rate
+
+    @property
+    def limit(self) -> int:
+        return self.__limit
+
+    @property
+    def in_flight(self) -> int:
+        return self.__in_flight
+
+    @property
+    def metrics(self) -> dict:
+        return {'rate': round(self.rate, 2), 'limit': self.limit, 'in_flight': self.in_flight}
+
+    async def acquire(self) -> None:
+        while self.__in_flight >= self.__limit:
+            waiter = asyncio.get_event_loop().create_future()
+            self.__waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self.__waiters:
+                    self.__waiters.remove(waiter)
+        self.__in_flight += 1
+        try:
+            await self.__bucket.take()
+        except BaseException:
+            self.__in_flight -= 1
+            self.__wake_waiters()
+            raise
+
+    def release(self, latency: float, status: Optional[int] = None) -> None:
+        self.__in_flight -= 1
+        self.__responses_since_decrease += 1
+        if status in self.THROTTLE_STATUSES:
+            self.__decrease()
+        else:
+            self.__latencies.append(latency)
+            self.__samples_since_adjust += 1
+            if self.__samples_since_adjust >= self.__window_size:
+                self.__adjust_to_latency()
+        self.__wake_waiters()
+
+    def __adjust_to_latency(self) -> None:
+        self.__samples_since_adjust = 0
+        latencies = sorted(self.__latencies)
+        p95 = latencies[int(0.95 * (len(latencies) - 1))]
+        if self.__baseline_p95 is None or p95 < self.__baseline_p95:
+            self.__baseline_p95 = p95
+
+        if p95 > self.__baseline_p95 * self.__latency_tolerance:
+            self.__decrease()
+        else:
+            self.__limit = min(self.__limit + 1, self.__max_limit)
+            self.__bucket.rate = min(self.__bucket.rate + self.__rate_step, self.__max_rate)
+
+    def __decrease(self) -> None:
+        if self.__responses_since_decrease < self.__window_size:
+            return
+        self.__responses_since_decrease = 0
+        self.__limit = max(int(self.__limit * self.__decrease_factor), self.__min_limit)
+        self.__bucket.rate = max(self.__bucket.rate * self.__decrease_factor, self.__min_rate)
+
+    def __wake_waiters(self) -> None:
+        available = self.__limit - self.__in_flight
+        for waiter in self.__waiters[:max(available, 0)]:
+            if not waiter.done():
+                waiter.set_result(None)
+
+
+BodyReader = Callable[[aiohttp.ClientResponse], Awaitable[Any]]
+
+
+async def read_response_body(response: aiohttp.ClientResponse, read_body: Optional[BodyReader]) -> Any:
+    if not read_body or response.status != 200:
+        return None
+    try:
+        return await read_body(response)
+    except BaseException:
+        response.release()
+        raise
+
+
+class RateLimitedSession:
+    def __init__(self, session: aiohttp.ClientSession, rate_limiter: AdaptiveRateLimiter) -> None:
+        self.__session = session
+        self.__rate_limiter = rate_limiter
+
+    async def request(self, method: str, url: str, **kwargs) -> aiohttp.ClientResponse:
+        response, _ = await self.fetch(method, url, **kwargs)
+        return response
+
+    async def fetch(self, method: str, url: str, read_body: Optional[BodyReader] = None,
+                    **kwargs) -> Tuple[aiohttp.ClientResponse, Any]:
+        # The slot is held until the body has been read, so in_flight, the limit and the latency samples
+        # cover whole transfers and not only the time to the response headers.
+        await self.__rate_limiter.acquire()
+        started = time.monotonic()
+        try:
+            response = await self.__session.request(method, url, **kwargs)
+            body = await read_response_body(response, read_body)
+        except BaseException:
+            self.__rate_limiter.release(time.monotonic() - started)
+            raise
+        self.__rate_limiter.release(time.monotonic() - started, response.status)
+        return response, body
+
+
+async def fetch_response(
+    session: Union[aiohttp.ClientSession, RateLimitedSession], method: str, url: str,
+    read_body: Optional[BodyReader] = None, **kwargs
+) -> Tuple[aiohttp.ClientResponse, Any]:
+    if isinstance(session, RateLimitedSession):
+        return await session.fetch(method, url, read_body, **kwargs)
+    response = await session.request(method, url, **kwargs)
+    return response, await read_response_body(response, read_body)
@@ -0,0 +1,63 @@
+import asyncio
+import random
+
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, NamedTuple, Optional
+
+import aiohttp
+
+
+class RetryPolicy(NamedTuple):
+    attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    jitter: float = 0.5
+
+    def get_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        retry_after_delay = parse_retry_after(retry_after)
+        if retry_after_delay is not None:
+            return min(retry_after_delay, self.max_delay)
+
+        backoff = min(self.base_delay * 2 ** (attempt - 1), self.max_delay)
+        return backoff * random.uniform(1 - self.jitter, 1)
+
+
+DEFAULT_RETRY_POLICIES: Dict[str, RetryPolicy] = {
+    'timeout': RetryPolicy(attempts=3, base_delay=1.0),
+    'connection': RetryPolicy(attempts=3, base_delay=0.5),
+    'throttled': RetryPolicy(attempts=5, base_delay=2.0, max_delay=60.0),
+    'server_error': RetryPolicy(attempts=3, base_delay=1.0),
+}
+
+
+def get_error_class(exception: Optional[BaseException] = None, status: Optional[int] = None) -> Optional[str]:
+    if exception is not None:
+        if isinstance(exception, (asyncio.TimeoutError, TimeoutError)):
+            return 'timeout'
+        connection_errors = (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, ConnectionError)
+        if isinstance(exception, connection_errors):
+            return 'connection'
+        return None
+
+    if status in (429, 503):
+        return 'throttled'
+    if status is not None and status >= 500:
+        return 'server_error'
+    return None
+
+
+def parse_retry_after(retry_after: Optional[str]) -> Optional[float]:
+    if not retry_after:
+        return None
+    try:
+        return max(float(retry_after), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_date = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    if retry_date.tzinfo is None:
+        retry_date = retry_date.replace(tzinfo=timezone.utc)
+    return max((retry_date - datetime.now(timezone.utc)).total_seconds(), 0.0)
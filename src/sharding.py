@@ -0,0 +1,93 @@
+import logging
+import multiprocessing
+import os
+import sys
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Iterator, List, Sequence
+
+from src.comic_index import ComicIndex, ComicRecord
+
+SHARD_INDEX_FILE = '.index-shard-{}.sqlite3'
+
+
+class LogRecordForwarder(logging.Handler):
+    def emit(self, record: logging.LogRecord) -> None:
+        logging.getLogger(record.name).handle(record)
+
+
+def get_shard_metadata_file(metadata_file: str, shard_id: object) -> str:
+    directory, file_name = os.path.split(metadata_file)
+    return os.path.join(directory, f'.shard-{shard_id}.{file_name}')
+
+
+def split_comic_ids(comic_ids: Sequence[int], shards: int) -> List[List[int]]:
+    return [list(comic_ids[shard_id::shards]) for shard_id in range(shards)]
+
+
+def get_importable_class(cls: type) -> type:
+    for base in cls.__mro__:
+        if getattr(sys.modules.get(base.__module__), base.__qualname__, None) is base:
+            return base
+    raise TypeError(f'{cls.__name__} has no importable base class')
+
+
+def get_shard_settings(downloader: object, shard_id: int, shards: int) -> Dict:
+    settings = {name: getattr(downloader, name) for name in dir(downloader) if name.isupper()}
+    settings.update({
+        'INDEX_FILE': SHARD_INDEX_FILE.format(shard_id),
+        'METRICS_FILE': None,
+        'PROMETHEUS_FILE': None,
+        'SHARDS': 1,
+        'METADATA_FILE': settings['METADATA_FILE'] and get_shard_metadata_file(
+            settings['METADATA_FILE'], shard_id
+        ),
+        'RATE_LIMIT': settings['RATE_LIMIT'] / shards,
+        'MAX_RATE_LIMIT': settings['MAX_RATE_LIMIT'] / shards,
+        'SOURCES': tuple(
+            source._replace(
+                rate_limit=source.rate_limit / shards, max_rate_limit=source.max_rate_limit / shards
+            ) for source in settings['SOURCES']
+        ),
+    })
+    return settings
+
+
+def init_shard_process(log_queue: multiprocessing.Queue, log_level: int) -> None:
+    root_logger = logging.getLogger()
+    root_logger.handlers = [QueueHandler(log_queue)]
+    root_logger.setLevel(log_level)
+
+
+def run_shard(downloader_class: type, settings: Dict, comic_ids: List[int],
+              records: List[ComicRecord], refresh: bool) -> Dict:
+    if records:
+        index = ComicIndex()
+        index.open(f'{settings["DIRECTORY"]}/{settings["INDEX_FILE"]}')
+        for record in records:
+            index.add(record)
+        index.close()
+
+    shard_class = type(f'{downloader_class.__name__}Shard', (downloader_class,), settings)
+    downloader = shard_class()
+    downloader.download_comics(comic_ids, refresh)
+    return {'saved_files': downloader.get_amout_of_saved_files, 'metrics': downloader.metrics.snapshot()}
+
+
+@contextmanager
+def create_shard_executor(shards: int) -> Iterator[ProcessPoolExecutor]:
+    context = multiprocessing.get_context('spawn')
+    log_queue = context.Queue()
+    listener = QueueListener(log_queue, LogRecordForwarder())
+    listener.start()
+    executor = ProcessPoolExecutor(
+        max_workers=shards, mp_context=context, initializer=init_shard_process,
+        initargs=(log_queue, logging.getLogger().getEffectiveLevel())
+    )
+    try:
+        yield executor
+    finally:
+        executor.shutdown(wait=True)
+        listener.stop()
@@ -0,0 +1,79 @@
+import argparse
+import logging
+import os
+
+from typing import Dict
+
+from src.blob_layout import LINK_KINDS, BlobLayout, is_blob_name
+from src.comic_index import ComicIndex
+from src.local_storage import replace_link
+from src.logging_config import configure_logging
+
+
+def migrate_directory(directory: str, layout: BlobLayout,
+                      index_file: str = '.index.sqlite3') -> Dict[str, int]:
+    summary = {'moved_files': 0, 'duplicated_files': 0, 'linked_comics': 0, 'shared_blobs': 0}
+    with os.scandir(directory) as entries:
+        file_names = [entry.name for entry in entries if entry.is_file() and is_blob_name(entry.name)]
+
+    for file_name in file_names:
+        file_hash, extension = file_name.split('.', 1)
+        blob_path = f'{directory}/{layout.get_blob_path(file_hash, extension)}'
+        file_path = f'{directory}/{file_name}'
+        if blob_path == file_path:
+            continue
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        if os.path.exists(blob_path):
+            os.remove(file_path)
+            summary['duplicated_files'] += 1
+        else:
+            os.replace(file_path, blob_path)
+            summary['moved_files'] += 1
+
+    index_path = f'{directory}/{index_file}'
+    if not os.path.exists(index_path):
+        return summary
+
+    index = ComicIndex()
+    index.open(index_path)
+    try:
+        comic_ids_by_blob = index.get_comic_ids_by_blob()
+    finally:
+        index.close()
+
+    for (file_hash, extension), comic_ids in comic_ids_by_blob.items():
+        summary['shared_blobs'] += len(comic_ids) > 1
+        blob_path = f'{directory}/{layout.get_blob_path(file_hash, extension)}'
+        if not layout.links or not os.path.exists(blob_path):
+            continue
+        for comic_id in comic_ids:
+            replace_link(blob_path, f'{directory}/{layout.get_link_path(comic_id, extension)}', layout.links)
+            summary['linked_comics'] += 1
+    return summary
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    default_layout = BlobLayout()
+    parser = argparse.ArgumentParser(description='Migrate a flat comics directory to the sharded blob layout')
+    parser.add_argument('directory')
+    parser.add_argument('--levels', type=int, default=default_layout.levels)
+    parser.add_argument('--width', type=int, default=default_layout.width)
+    parser.add_argument('--links', choices=LINK_KINDS, help='create a link per comic id')
+    parser.add_argument('--links-directory', default=default_layout.links_directory)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    configure_logging()
+    layout = BlobLayout(True, args.levels, args.width, args.links, args.links_directory)
+    summary = migrate_directory(args.directory, layout)
+    logging.info(
+        'Migration of "%s/" finished: %d files moved, %d duplicated files removed, %d comics linked, '
+        '%d blobs shared by more than one comic', args.directory, summary['moved_files'],
+        summary['duplicated_files'], summary['linked_comics'], summary['shared_blobs']
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import unittest
+
+from hashlib import md5
+from os import listdir, makedirs, path
+from shutil import rmtree
+
+from src.archive_verifier import discard_broken_comics, find_blob_files, hash_mapped_file, verify_archive
+from src.comic_index import ComicIndex, ComicRecord
+
+
+class TestArchiveVerifier(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = 'directory_of_test'
+        makedirs(f'{self.directory}/by-id')
+        self.hashes = [md5(content).hexdigest() for content in (b'first', b'second', b'third')]
+        self.write_file(f'{self.hashes[0]}.png', b'first')
+        self.write_file(f'{self.hashes[1]}.png', b'sec')
+        self.write_file('by-id/1.png', b'first')
+        index = ComicIndex()
+        index.open(f'{self.directory}/.index.sqlite3')
+        for comic_id, file_hash in enumerate(self.hashes, start=1):
+            index.add(ComicRecord(comic_id, '', file_hash, 'png', 5))
+        index.add(ComicRecord(4, '', self.hashes[1], 'png', 6))
+        index.close()
+
+    def tearDown(self) -> None:
+        rmtree(self.directory)
+
+    def write_file(self, file_name: str, content: bytes) -> None:
+        with open(f'{self.directory}/{file_name}', 'wb') as file:
+            file.write(content)
+
+    def test_hash_file_through_memory_map(self):
+        self.assertEqual(
+            (f'{self.directory}/{self.hashes[0]}.png', self.hashes[0]),
+            hash_mapped_file(f'{self.directory}/{self.hashes[0]}.png')
+        )
+        self.write_file('empty.png', b'')
+        self.assertEqual(md5().hexdigest(), hash_mapped_file(f'{self.directory}/empty.png')[1])
+        self.assertIsNone(hash_mapped_file(f'{self.directory}/missing.png')[1])
+
+    def test_find_only_blob_files(self):
+        self.assertEqual(
+            sorted(f'{self.directory}/{file_hash}.png' for file_hash in self.hashes[:2]),
+            sorted(find_blob_files(self.directory))
+        )
+
+    def test_report_corrupt_files_and_broken_comics(self):
+        for workers in (1, 2):
+            report = verify_archive(self.directory, workers=workers)
+            self.assertEqual(2, report.checked_files)
+            self.assertEqual([f'{self.directory}/{self.hashes[1]}.png'], report.corrupt_files)
+            self.assertEqual([3], report.missing_ids)
+            self.assertEqual([2, 4], report.corrupt_ids)
+            self.assertEqual([2, 3, 4], report.broken_ids)
+
+    def test_discard_corrupt_files_and_mark_broken_comics_as_failed(self):
+        report = verify_archive(self.directory, workers=1)
+        discard_broken_comics(self.directory, report)
+        self.assertFalse(path.exists(f'{self.directory}/{self.hashes[1]}.png'))
+        self.assertIn(f'{self.hashes[0]}.png', listdir(self.directory))
+        index = ComicIndex()
+        index.open(f'{self.directory}/.index.sqlite3')
+        try:
+            self.assertEqual({1}, index.completed_ids())
+            self.assertEqual([2, 3, 4], index.failed_ids())
+        finally:
+            index.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
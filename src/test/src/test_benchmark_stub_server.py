@@ -0,0 +1,154 @@
+import asyncio
+import json
+import unittest
+
+from hashlib import md5
+from os import listdir, path
+from queue import Queue
+from shutil import rmtree
+from threading import Thread
+
+from aiohttp import ClientSession
+
+from benchmarks.stub_server import StubServerConfig, XkcdStubServer, run_stub_server
+from src.comic_index import ComicResult
+from src.metadata_export import iter_metadata
+from src.test.src.test_xkcd_async_downloader import async_test
+from src.xkcd_async_downloader import XkcdAsyncDownloader
+
+
+class StubServerTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.config = StubServerConfig(comic_count=20, image_size=5000)
+        self.directory = 'directory_of_test'
+        self.base_url = self.start_stub_server()
+
+    def tearDown(self) -> None:
+        rmtree(self.directory, ignore_errors=True)
+
+    def start_stub_server(self) -> str:
+        port_queue = Queue()
+        Thread(target=run_stub_server, args=(self.config, port_queue), daemon=True).start()
+        return port_queue.get(timeout=5)
+
+    def create_downloader(self, **attributes) -> XkcdAsyncDownloader:
+        settings = {
+            'DIRECTORY': self.directory, 'URL_API': f'{self.base_url}/{{}}/info.0.json',
+            'RATE_LIMIT': 1000.0, 'MAX_RATE_LIMIT': 1000.0
+        }
+        settings.update(attributes)
+        return type('StubDownloader', (XkcdAsyncDownloader,), settings)()
+
+    def get_saved_files(self) -> set:
+        return {
+            name for name in listdir(self.directory)
+            if not name.startswith('.') and path.isfile(f'{self.directory}/{name}')
+        }
+
+
+class TestXkcdStubServer(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = XkcdStubServer(StubServerConfig(comic_count=3, image_size=1000))
+
+    @async_test
+    async def test_serve_last_index_comic_json_and_image(self):
+        base_url = await self.server.start()
+        try:
+            async with ClientSession() as session:
+                async with session.get(f'{base_url}//info.0.json') as response:
+                    self.assertEqual(3, (await response.json())['num'])
+                async with session.get(f'{base_url}/2/info.0.json') as response:
+                    image_url = (await response.json())['img']
+                async with session.get(image_url) as response:
+                    self.assertEqual('image/png', response.headers['Content-Type'])
+                    self.assertEqual(self.server.get_image_content(2), await response.read())
+                async with session.get(f'{base_url}/4/info.0.json') as response:
+                    self.assertEqual(404, response.status)
+        finally:
+            await self.server.stop()
+        self.assertEqual({'200': 3, '404': 1}, self.server.stats['statuses'])
+
+    def test_return_distinct_images_with_configured_size(self):
+        first_image = self.server.get_image_content(1)
+        self.assertEqual(1000, len(first_image))
+        self.assertNotEqual(first_image, self.server.get_image_content(2))
+
+
+class TestDownloaderAgainstStubServer(StubServerTestCase):
+    def test_download_every_comic_once(self):
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        with self.assertLogs() as captured_log:
+            downloader = self.create_downloader()
+            downloader.make_download()
+
+        server = XkcdStubServer(self.config)
+        expected_files = {f'{md5(server.get_image_content(i)).hexdigest()}.png' for i in range(1, 21)}
+        self.assertEqual(expected_files, self.get_saved_files())
+        self.assertEqual(20, downloader.get_amout_of_saved_files)
+        self.assertTrue(any('Progress: 20 comics saved' in line for line in captured_log.output))
+        metadata = list(iter_metadata(f'{self.directory}/metadata/comics.ndjson'))
+        self.assertEqual(list(range(1, 21)), sorted(comic['num'] for comic in metadata))
+        self.assertEqual('Alt text of comic 1', min(metadata, key=lambda comic: comic['num'])['alt'])
+        with open(f'{self.directory}/.metrics.json') as file:
+            metrics = json.load(file)
+        self.assertEqual({'total': 20}, metrics['counters']['saved_files_total'])
+        self.assertEqual(20, metrics['histograms']['api_latency_seconds']['count'])
+
+    def test_make_download_twice_in_the_same_process(self):
+        downloader = self.create_downloader()
+        downloader.make_download()
+        downloader.make_download(refresh=True)
+
+        self.assertEqual(20, downloader.get_amout_of_saved_files)
+        self.assertEqual(41, downloader.metrics.get_counter_total('requests_total'))
+        self.assertEqual(0, downloader.metrics.get_counter('saved_files_total'))
+        with open(f'{self.directory}/.metrics.json') as file:
+            self.assertEqual({'total': 41}, json.load(file)['counters']['requests_total'])
+
+    @async_test
+    async def test_stream_results_with_external_session(self):
+        downloader = self.create_downloader()
+        async with ClientSession() as session:
+            results = [result async for result in downloader.iter_download(range(1, 6), session=session)]
+            comic = await downloader.download_comic(21, session=session)
+            refreshed = await downloader.download_range(4, 7, refresh=True, session=session)
+            self.assertFalse(session.closed)
+
+        self.assertEqual(list(range(1, 6)), sorted(result.comic_id for result in results))
+        self.assertEqual({'stored'}, {result.status for result in results})
+        self.assertEqual('png', results[0].record.extension)
+        self.assertEqual(ComicResult(21, 'failed'), comic)
+        self.assertEqual(
+            [(4, 'stored'), (5, 'stored'), (6, 'stored'), (7, 'stored')],
+            [(result.comic_id, result.status) for result in refreshed]
+        )
+        self.assertEqual(7, downloader.get_amout_of_saved_files)
+
+    @async_test
+    async def test_stop_run_abandoned_by_consumer_before_the_next_one(self):
+        downloader = self.create_downloader()
+        async with ClientSession() as session:
+            async for result in downloader.iter_download(range(1, 15), session=session):
+                break
+            results = await downloader.download_range(15, 20, session=session)
+
+        self.assertEqual([(i, 'stored') for i in range(15, 21)], [(r.comic_id, r.status) for r in results])
+        self.assertEqual(6, downloader.metrics.get_counter('saved_files_total'))
+
+    @async_test
+    async def test_serialize_concurrent_runs_of_the_same_downloader(self):
+        downloader = self.create_downloader()
+        async with ClientSession() as session:
+            first, second = await asyncio.gather(
+                downloader.download_range(1, 10, session=session),
+                downloader.download_range(11, 20, session=session)
+            )
+
+        self.assertEqual(list(range(1, 11)), [result.comic_id for result in first])
+        self.assertEqual(list(range(11, 21)), [result.comic_id for result in second])
+        self.assertEqual({'stored'}, {result.status for result in first + second})
+        self.assertEqual(20, downloader.get_amout_of_saved_files)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import unittest
+
+from src.blob_layout import BlobLayout, is_blob_name
+
+
+class TestBlobLayout(unittest.TestCase):
+    def setUp(self) -> None:
+        self.file_hash = '2f00e94162e4023b0270a3f309588075'
+
+    def test_return_flat_blob_path_by_default(self):
+        self.assertEqual(f'{self.file_hash}.png', BlobLayout().get_blob_path(self.file_hash, 'png'))
+
+    def test_return_sharded_blob_path(self):
+        self.assertEqual(
+            f'2f/00/{self.file_hash}.png', BlobLayout(sharded=True).get_blob_path(self.file_hash, 'png')
+        )
+        self.assertEqual(
+            f'2f0/{self.file_hash}.png',
+            BlobLayout(sharded=True, levels=1, width=3).get_blob_path(self.file_hash, 'png')
+        )
+
+    def test_return_link_path_only_when_links_are_enabled(self):
+        self.assertIsNone(BlobLayout().get_link_path(2579, 'png'))
+        self.assertEqual('by-id/2579.png', BlobLayout(links='symlink').get_link_path(2579, 'png'))
+
+    def test_recognize_blob_names(self):
+        self.assertTrue(is_blob_name(f'{self.file_hash}.png'))
+        self.assertFalse(is_blob_name('.index.sqlite3'))
+        self.assertFalse(is_blob_name('2579.png'))
@@ -0,0 +1,126 @@
+import asyncio
+import unittest
+
+from os import makedirs, path, remove
+
+from src.checkpoint_journal import CheckpointJournal, load_journal
+from src.comic_index import ComicIndex, ComicRecord
+from src.test.src.test_benchmark_stub_server import StubServerTestCase
+
+
+class TestCheckpointJournal(unittest.TestCase):
+    def setUp(self) -> None:
+        self.journal_path = 'journal_of_test.ndjson'
+        self.header = {'incremental': False, 'refresh': False, 'retry_failed': False, 'last_index': 10}
+        self.record = ComicRecord(1, 'https://imgs.xkcd.com/comics/a.png', 'hash', 'png', 10, '"etag"')
+        self.comic_data = {
+            'image_url': 'https://imgs.xkcd.com/comics/b.png', 'etag': None, 'last_modified': None
+        }
+
+    def tearDown(self) -> None:
+        if path.exists(self.journal_path):
+            remove(self.journal_path)
+
+    def test_return_none_when_journal_does_not_exist(self):
+        self.assertIsNone(load_journal(self.journal_path))
+
+    def test_load_states_written_by_journal(self):
+        journal = CheckpointJournal(self.journal_path)
+        journal.open(self.header)
+        journal.record_metadata(1, self.comic_data)
+        journal.record_stored(self.record)
+        journal.record_metadata(2, self.comic_data)
+        journal.record_failed(3)
+        journal.close()
+
+        state = load_journal(self.journal_path)
+        self.assertEqual('run', state.header['state'])
+        self.assertEqual(10, state.header['last_index'])
+        self.assertEqual({1: self.comic_data, 2: self.comic_data}, state.metadata)
+        self.assertEqual({1: self.record}, state.records)
+        self.assertEqual({3}, state.failed)
+        self.assertEqual({1, 3}, state.finished_ids)
+
+    def test_buffer_entries_until_batch_is_full(self):
+        journal = CheckpointJournal(self.journal_path, batch_size=2)
+        journal.open(self.header)
+        journal.record_failed(1)
+        self.assertEqual(set(), load_journal(self.journal_path).failed)
+        journal.record_failed(2)
+        self.assertEqual({1, 2}, load_journal(self.journal_path).failed)
+        journal.close()
+
+    def test_call_before_flush_hook_before_writing_entries(self):
+        lines_seen_by_hook = []
+        journal = CheckpointJournal(
+            self.journal_path, batch_size=2,
+            before_flush=lambda: lines_seen_by_hook.append(len(open(self.journal_path).readlines()))
+        )
+        journal.open(self.header)
+        journal.record_failed(1)
+        journal.record_failed(2)
+        journal.close()
+        self.assertEqual([0, 1], lines_seen_by_hook)
+        self.assertEqual({1, 2}, load_journal(self.journal_path).failed)
+
+    def test_ignore_torn_last_line_and_append_when_resumed(self):
+        journal = CheckpointJournal(self.journal_path)
+        journal.open(self.header)
+        journal.record_failed(1)
+        journal.close()
+        with open(self.journal_path, 'a') as file:
+            file.write('{"state":"fai')
+        self.assertEqual({1}, load_journal(self.journal_path).failed)
+
+        with open(self.journal_path, 'r+') as file:
+            content = file.read()
+            file.seek(0)
+            file.write(content[:content.rindex('\n') + 1])
+            file.truncate()
+        journal.open(self.header, resume=True)
+        journal.record_stored(self.record._replace(comic_id=2))
+        journal.close()
+        state = load_journal(self.journal_path)
+        self.assertEqual({1}, state.failed)
+        self.assertEqual([2], list(state.records))
+
+    def test_ignore_entries_when_journal_is_not_open(self):
+        journal = CheckpointJournal()
+        journal.open(self.header)
+        journal.record_failed(1)
+        journal.close()
+        self.assertFalse(journal.is_open)
+
+
+class TestResumeFromCheckpointJournal(StubServerTestCase):
+    def test_resume_interrupted_run_from_checkpoint_journal(self):
+        makedirs(self.directory)
+        journal = CheckpointJournal(f'{self.directory}/.journal.ndjson')
+        journal.open({'incremental': False, 'refresh': False, 'retry_failed': False, 'last_index': 20})
+        for comic_id in range(1, 6):
+            journal.record_stored(ComicRecord(comic_id, '', f'hash{comic_id}', 'png', 0))
+        journal.record_failed(6)
+        journal.record_metadata(7, {
+            'image_url': f'{self.base_url}/comics/7.png', 'etag': None, 'last_modified': None
+        })
+        journal.close()
+
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        with self.assertLogs() as captured_log:
+            downloader = self.create_downloader()
+            downloader.make_download(resume=True)
+
+        self.assertIn(
+            'INFO:root:Resume mode: 6 comics already finished and 1 comics waiting for the image stage',
+            captured_log.output
+        )
+        self.assertEqual(14, downloader.get_amout_of_saved_files)
+        self.assertEqual(27, downloader.metrics.get_counter('requests_total'))
+        self.assertFalse(path.exists(f'{self.directory}/.journal.ndjson'))
+        index = ComicIndex()
+        index.open(f'{self.directory}/.index.sqlite3')
+        try:
+            self.assertEqual(set(range(1, 21)) - {6}, index.completed_ids())
+            self.assertEqual([6], index.failed_ids())
+        finally:
+            index.close()
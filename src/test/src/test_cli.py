@@ -0,0 +1,145 @@
+import io
+import json
+import subprocess
+import sys
+import unittest
+
+from contextlib import redirect_stderr, redirect_stdout
+from hashlib import md5
+from os import makedirs, path, remove
+from shutil import rmtree
+
+from benchmarks.stub_server import XkcdStubServer
+
+from src.cli import (
+    DEFAULT_DIRECTORY, DEFAULT_URL_API, INDEX_FILE, JOURNAL_FILE, create_downloader, get_status, main,
+    parse_args, plan_comic_ids
+)
+from src.blob_layout import BlobLayout
+from src.comic_index import ComicIndex, ComicRecord
+from src.test.src.test_benchmark_stub_server import StubServerTestCase
+from src.xkcd_async_downloader import XkcdAsyncDownloader
+
+
+class TestCli(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = 'directory_of_test'
+        makedirs(self.directory)
+
+    def tearDown(self) -> None:
+        rmtree(self.directory)
+
+    def create_index(self) -> None:
+        index = ComicIndex()
+        index.open(f'{self.directory}/{INDEX_FILE}')
+        for comic_id in (1, 2, 3, 5):
+            index.add(ComicRecord(comic_id, '', f'hash{comic_id}', 'png', 5))
+        index.add_failed(4)
+        index.set_last_crawled_id(5)
+        index.close()
+
+    def test_defaults_match_downloader_settings(self):
+        self.assertEqual(XkcdAsyncDownloader.DIRECTORY, DEFAULT_DIRECTORY)
+        self.assertEqual(XkcdAsyncDownloader.URL_API, DEFAULT_URL_API)
+        self.assertEqual(XkcdAsyncDownloader.INDEX_FILE, INDEX_FILE)
+        self.assertEqual(XkcdAsyncDownloader.JOURNAL_FILE, JOURNAL_FILE)
+
+    def test_status_of_directory_without_index(self):
+        self.assertEqual({
+            'directory': self.directory, 'indexed_comics': 0, 'failed_comics': 0, 'last_crawled_id': 0,
+            'interrupted_run': False
+        }, get_status(self.directory))
+
+    def test_status_of_indexed_directory(self):
+        self.create_index()
+        open(f'{self.directory}/{JOURNAL_FILE}', 'w').close()
+        status = get_status(self.directory)
+        self.assertEqual(4, status['indexed_comics'])
+        self.assertEqual(1, status['failed_comics'])
+        self.assertEqual(5, status['last_crawled_id'])
+        self.assertTrue(status['interrupted_run'])
+
+    def test_plan_comic_ids_of_each_mode(self):
+        self.create_index()
+        base_args = ['--directory', self.directory, '--first', '2', '--last', '7']
+        self.assertEqual([4, 6, 7], plan_comic_ids(parse_args(base_args)))
+        self.assertEqual([4, 6, 7], plan_comic_ids(parse_args(base_args + ['--only-new'])))
+        self.assertEqual([4], plan_comic_ids(parse_args(base_args + ['--retry-failed'])))
+        self.assertEqual([2, 3, 4, 5, 6, 7], plan_comic_ids(parse_args(base_args + ['--refresh'])))
+
+    def test_reject_range_with_shards_or_resume(self):
+        for option in (['--shards', '2'], ['--resume']):
+            with self.subTest(option=option), redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+                parse_args(['--first', '1', '--last', '10'] + option)
+
+    def test_dry_run_report_as_json(self):
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            exit_code = main(['--directory', self.directory, '--last', '3', '--dry-run', '--json'])
+        self.assertEqual(0, exit_code)
+        self.assertIn('"comics": 3', stdout.getvalue())
+
+    def test_verify_report_broken_comics_with_exit_code(self):
+        self.create_index()
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            self.assertEqual(1, main(['--directory', self.directory, '--verify', '--workers', '1', '--json']))
+        self.assertEqual([1, 2, 3, 5], json.loads(stdout.getvalue())['missing_comics'])
+
+    def test_concurrency_scales_rate_limiter_and_connector(self):
+        instance = create_downloader(parse_args(['--directory', self.directory, '--concurrency', '30']))
+        self.assertEqual(
+            (30, 30, 60), (instance.API_CONCURRENCY, instance.IMAGE_CONCURRENCY, instance.CONCURRENCY)
+        )
+        profile = instance.CONNECTOR_PROFILE
+        self.assertEqual((60, 30), (profile.limit, profile.limit_per_host))
+
+    def test_downloader_uses_blob_layout_of_migrated_directory(self):
+        args = parse_args(
+            ['--directory', self.directory, '--sharded-layout', '--levels', '1', '--links', 'symlink']
+        )
+        self.assertEqual(BlobLayout(True, 1, 2, 'symlink', 'by-id'), create_downloader(args).BLOB_LAYOUT)
+
+    def test_status_query_does_not_import_heavy_modules(self):
+        code = (
+            'import sys\n'
+            'from src.cli import main\n'
+            f'main(["--status", "--directory", "{self.directory}"])\n'
+            'heavy_modules = ("aiohttp", "src.archive_verifier", "multiprocessing")\n'
+            'sys.exit(any(name in sys.modules for name in heavy_modules))\n'
+        )
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True)
+        self.assertEqual(0, result.returncode, result.stderr)
+
+
+class TestCliAgainstStubServer(StubServerTestCase):
+    def test_repair_corrupt_and_missing_files_from_command_line(self):
+        arguments = ['--directory', self.directory, '--url-api', f'{self.base_url}/{{}}/info.0.json']
+        with redirect_stdout(io.StringIO()):
+            main(arguments + ['--log-level', 'WARNING'])
+        server = XkcdStubServer(self.config)
+        first_file = f'{self.directory}/{md5(server.get_image_content(1)).hexdigest()}.png'
+        second_file = f'{self.directory}/{md5(server.get_image_content(2)).hexdigest()}.png'
+        with open(first_file, 'r+b') as file:
+            file.truncate(100)
+        remove(second_file)
+
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            self.assertEqual(1, main(arguments + ['--verify', '--json']))
+        report = json.loads(stdout.getvalue())
+        self.assertEqual(([2], [1]), (report['missing_comics'], report['corrupt_comics']))
+
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            self.assertEqual(0, main(arguments + ['--repair', '--json', '--log-level', 'WARNING']))
+        self.assertEqual([], json.loads(stdout.getvalue())['unrepaired_comics'])
+        with open(first_file, 'rb') as file:
+            self.assertEqual(server.get_image_content(1), file.read())
+        self.assertTrue(path.isfile(second_file))
+        with redirect_stdout(io.StringIO()):
+            self.assertEqual(0, main(arguments + ['--verify']))
+
+
+if __name__ == '__main__':
+    unittest.main()
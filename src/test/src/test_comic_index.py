@@ -0,0 +1,95 @@
+import sqlite3
+import unittest
+
+from os import remove
+
+from src.comic_index import ComicIndex, ComicRecord
+
+
+class TestComicIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self.index_path = 'index_of_test.sqlite3'
+        self.index = ComicIndex()
+        self.index.open(self.index_path)
+        self.record = ComicRecord(
+            2579, 'https://imgs.xkcd.com/comics/tractor_beam.png',
+            '2f00e94162e4023b0270a3f309588075', 'png', 79575, '6203fd39-136d7'
+        )
+
+    def tearDown(self) -> None:
+        self.index.close()
+        try:
+            remove(self.index_path)
+        except FileNotFoundError:
+            pass
+
+    def test_return_added_record(self):
+        self.index.add(self.record)
+        self.assertEqual(self.record, self.index.get(self.record.comic_id))
+
+    def test_merge_records_and_failed_ids_of_shard_index(self):
+        shard_index_path = 'shard_index_of_test.sqlite3'
+        self.index.add_failed(self.record.comic_id)
+        self.index.add_failed(1)
+        shard_index = ComicIndex()
+        shard_index.open(shard_index_path)
+        shard_index.add(self.record)
+        shard_index.add_failed(2)
+        shard_index.close()
+        try:
+            self.index.merge(shard_index_path)
+        finally:
+            remove(shard_index_path)
+        self.assertEqual(self.record, self.index.get(self.record.comic_id))
+        self.assertEqual([1, 2], self.index.failed_ids())
+
+    def test_return_none_when_comic_id_is_not_indexed(self):
+        self.assertIsNone(self.index.get(1))
+
+    def test_return_completed_ids(self):
+        self.index.add(self.record)
+        self.index.add(self.record._replace(comic_id=1))
+        self.assertEqual({1, 2579}, self.index.completed_ids())
+
+    def test_return_failed_ids_until_comic_is_added(self):
+        self.index.add_failed(self.record.comic_id)
+        self.index.add_failed(1)
+        self.assertEqual([1, 2579], self.index.failed_ids())
+        self.index.add(self.record)
+        self.assertEqual([1], self.index.failed_ids())
+
+    def test_move_broken_record_to_failed_ids(self):
+        self.index.add(self.record)
+        self.index.mark_failed(self.record.comic_id)
+        self.assertIsNone(self.index.get(self.record.comic_id))
+        self.assertEqual([self.record.comic_id], self.index.failed_ids())
+
+    def test_return_last_crawled_id(self):
+        self.assertEqual(0, self.index.get_last_crawled_id())
+        self.index.set_last_crawled_id(2579)
+        self.assertEqual(2579, self.index.get_last_crawled_id())
+
+    def test_add_validator_columns_to_index_created_without_them(self):
+        self.index.close()
+        remove(self.index_path)
+        connection = sqlite3.connect(self.index_path)
+        connection.execute(
+            'CREATE TABLE comics (comic_id INTEGER PRIMARY KEY, image_url TEXT NOT NULL, '
+            'md5 TEXT NOT NULL, extension TEXT NOT NULL, size INTEGER NOT NULL, etag TEXT)'
+        )
+        connection.execute("INSERT INTO comics VALUES (1, 'url', 'hash', 'png', 10, NULL)")
+        connection.commit()
+        connection.close()
+
+        self.index.open(self.index_path)
+        self.assertEqual(ComicRecord(1, 'url', 'hash', 'png', 10), self.index.get(1))
+
+    def test_persist_records_after_reopen(self):
+        self.index.add(self.record)
+        self.index.close()
+        self.index.open(self.index_path)
+        self.assertEqual(self.record, self.index.get(self.record.comic_id))
+
+
+if __name__ == '__main__':
+    unittest.main()
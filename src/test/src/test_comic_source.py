@@ -0,0 +1,114 @@
+import unittest
+
+from src.comic_source import ComicSource, SourceClient, SourcePool
+from src.metadata_export import iter_metadata
+from src.rate_limiter import AdaptiveRateLimiter
+from src.test.src.test_benchmark_stub_server import StubServerTestCase
+from src.test.src.test_xkcd_async_downloader import async_test
+
+
+class CacheProxySource(ComicSource):
+    def get_metadata_url(self, comic_id: int) -> str:
+        return f'{self.url_api.format("")}?id={comic_id}'
+
+    def parse_latest_id(self, content: dict) -> int:
+        return content['latest']['num']
+
+    def parse_image_url(self, content: dict) -> str:
+        return content['assets'][0]
+
+
+class TestComicSource(unittest.TestCase):
+    def test_build_urls_and_parse_xkcd_json(self):
+        source = ComicSource()
+        self.assertEqual('https://xkcd.com//info.0.json', source.get_latest_url())
+        self.assertEqual('https://xkcd.com/2579/info.0.json', source.get_metadata_url(2579))
+        self.assertEqual(2579, source.parse_latest_id({'num': 2579}))
+        image_url = 'https://imgs.xkcd.com/a.png'
+        self.assertEqual(image_url, source.parse_image_url({'img': image_url}))
+
+    def test_override_url_and_parsing_in_plugin(self):
+        source = CacheProxySource('cache', 'http://cache.local/comics{}')
+        self.assertEqual('http://cache.local/comics?id=7', source.get_metadata_url(7))
+        self.assertEqual(9, source.parse_latest_id({'latest': {'num': 9}}))
+        image_url = 'http://cache.local/7.png'
+        self.assertEqual(image_url, source.parse_image_url({'assets': [image_url]}))
+
+
+class TestSourcePool(unittest.TestCase):
+    def setUp(self) -> None:
+        self.clients = [
+            SourceClient(ComicSource(name), f'session of {name}', AdaptiveRateLimiter(1000.0, 1000.0, 2, 2))
+            for name in ('primary', 'mirror')
+        ]
+        self.pool = SourcePool(self.clients)
+
+    @async_test
+    async def test_select_least_loaded_source_and_prefer_primary_on_ties(self):
+        self.assertIs(self.clients[0], self.pool.select())
+        await self.clients[0].rate_limiter.acquire()
+        self.assertIs(self.clients[1], self.pool.select())
+        await self.clients[1].rate_limiter.acquire()
+        self.assertIs(self.clients[0], self.pool.select())
+
+    def test_select_only_sources_not_excluded(self):
+        self.assertIs(self.clients[1], self.pool.select({'primary'}))
+        self.assertIsNone(self.pool.select({'primary', 'mirror'}))
+
+    def test_get_source_by_name_or_primary(self):
+        self.assertIs(self.clients[1], self.pool.get('mirror'))
+        self.assertIs(self.clients[0], self.pool.get('unknown'))
+        self.assertIs(self.clients[0], self.pool.get())
+
+
+class PartialSource(ComicSource):
+    def get_metadata_url(self, comic_id: int) -> str:
+        return super().get_metadata_url(comic_id + 1000 if comic_id % 2 else comic_id)
+
+
+class BrokenParserSource(ComicSource):
+    def parse_image_url(self, content: dict) -> str:
+        if content['num'] % 5 == 0:
+            raise KeyError('img')
+        return super().parse_image_url(content)
+
+
+class TestSourcesAgainstStubServer(StubServerTestCase):
+    @async_test
+    async def test_fall_back_and_report_comics_whose_data_can_not_be_parsed(self):
+        mirror_url = self.start_stub_server()
+        downloader = self.create_downloader(SOURCES=(
+            BrokenParserSource('primary', f'{self.base_url}/{{}}/info.0.json', 1000.0, 1000.0),
+            BrokenParserSource('mirror', f'{mirror_url}/{{}}/info.0.json', 1000.0, 1000.0),
+        ))
+        with self.assertLogs():
+            results = await downloader.download_range(1, 10)
+
+        self.assertEqual(list(range(1, 11)), [result.comic_id for result in results])
+        failed_ids = [result.comic_id for result in results if result.status == 'failed']
+        self.assertEqual([5, 10], failed_ids)
+        self.assertEqual(4, downloader.metrics.get_counter('errors_total', stage='api', type='KeyError'))
+        self.assertEqual(2, downloader.metrics.get_counter_total('source_fallbacks_total'))
+
+    def test_crawl_primary_and_mirror_sources_with_fallback(self):
+        mirror_url = self.start_stub_server()
+        downloader = self.create_downloader(SOURCES=(
+            PartialSource('primary', f'{self.base_url}/{{}}/info.0.json', 1000.0, 1000.0),
+            ComicSource('mirror', f'{mirror_url}/{{}}/info.0.json', 1000.0, 1000.0),
+        ))
+        with self.assertLogs() as captured_log:
+            downloader.make_download()
+
+        self.assertEqual(20, downloader.get_amout_of_saved_files)
+        metrics = downloader.metrics
+        fallbacks = metrics.get_counter('source_fallbacks_total', source='mirror')
+        self.assertLessEqual(fallbacks, 10)
+        self.assertEqual(20 + fallbacks, metrics.get_counter_total('metadata_requests_total'))
+        self.assertGreater(metrics.get_counter('metadata_requests_total', source='mirror'), 0)
+        self.assertTrue(any('Rate limiter final state of mirror' in line for line in captured_log.output))
+        metadata = iter_metadata(f'{self.directory}/metadata/comics.ndjson')
+        self.assertEqual(list(range(1, 21)), sorted(comic['num'] for comic in metadata))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+
+from src.connector_profile import ConnectorProfile
+from src.test.src.test_xkcd_async_downloader import async_test
+
+
+class TestConnectorProfile(unittest.TestCase):
+    def setUp(self) -> None:
+        self.profile = ConnectorProfile(
+            limit=8, limit_per_host=4, keepalive_timeout=15.0, ttl_dns_cache=60,
+            connect_timeout=5.0, sock_read_timeout=20.0, compress_api=False
+        )
+
+    def test_create_timeout_without_total_limit(self):
+        timeout = self.profile.create_timeout()
+        self.assertIsNone(timeout.total)
+        self.assertEqual(5.0, timeout.connect)
+        self.assertEqual(20.0, timeout.sock_read)
+
+    @async_test
+    async def test_create_connector_with_profile_limits(self):
+        connector = self.profile.create_connector()
+        self.assertEqual(8, connector.limit)
+        self.assertEqual(4, connector.limit_per_host)
+        await connector.close()
+
+    def test_request_compression_only_for_api_when_enabled(self):
+        self.assertEqual({'Accept-Encoding': 'identity'}, self.profile.get_api_headers())
+        self.assertEqual({'Accept-Encoding': 'gzip, deflate'}, ConnectorProfile().get_api_headers())
+        self.assertEqual({'Accept-Encoding': 'identity'}, ConnectorProfile().get_image_headers())
+
+
+if __name__ == '__main__':
+    unittest.main()
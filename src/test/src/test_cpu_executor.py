@@ -0,0 +1,62 @@
+import threading
+import unittest
+
+from hashlib import md5
+from os import remove
+
+from src.cpu_executor import CpuExecutor, hash_file
+from src.test.src.test_xkcd_async_downloader import async_test
+
+
+def get_thread_name(_: bytes) -> str:
+    return threading.current_thread().name
+
+
+class TestHashFile(unittest.TestCase):
+    def setUp(self) -> None:
+        self.file_path = 'file_of_test.bin'
+        self.content = bytes(range(256)) * 100
+        with open(self.file_path, 'wb') as file:
+            file.write(self.content)
+
+    def tearDown(self) -> None:
+        remove(self.file_path)
+
+    def test_return_md5_of_file_read_in_chunks(self):
+        self.assertEqual(md5(self.content).hexdigest(), hash_file(self.file_path, chunk_size=1000))
+
+
+class TestCpuExecutor(unittest.TestCase):
+    def test_raise_value_error_for_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            CpuExecutor('gpu')
+
+    @async_test
+    async def test_run_function_in_thread_pool(self):
+        executor = CpuExecutor('thread', workers=1)
+        try:
+            thread_name = await executor.run(get_thread_name, b'data')
+        finally:
+            executor.close()
+        self.assertTrue(thread_name.startswith('cpu'))
+
+    @async_test
+    async def test_run_inline_when_payload_is_smaller_than_min_offload_size(self):
+        executor = CpuExecutor('thread', workers=1, min_offload_size=1024)
+        try:
+            thread_name = await executor.run(get_thread_name, b'data', size=4)
+        finally:
+            executor.close()
+        self.assertEqual(threading.current_thread().name, thread_name)
+
+    @async_test
+    async def test_run_function_in_process_pool(self):
+        executor = CpuExecutor('process', workers=1)
+        try:
+            ordered = await executor.run(sorted, [3, 1, 2])
+            thread_name = await executor.run(get_thread_name, b'data')
+        finally:
+            executor.close()
+        self.assertEqual([1, 2, 3], ordered)
+        self.assertEqual('MainThread', thread_name)
+        self.assertFalse(executor.shares_memory)
@@ -0,0 +1,95 @@
+import errno
+import unittest
+
+from os import listdir, makedirs, mkdir, path, stat
+from shutil import rmtree
+from unittest.mock import patch
+
+from src.local_storage import LocalStorage
+from src.test.src.test_xkcd_async_downloader import async_test
+
+
+class TestLocalStorage(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = 'directory_of_test'
+        mkdir(self.directory)
+        for file_name in ('a.png', 'b.jpeg', '.1.part', '.index.sqlite3'):
+            with open(f'{self.directory}/{file_name}', 'wb') as file:
+                file.write(b'content')
+        self.storage = LocalStorage(write_workers=2, fsync_batch_size=2)
+        self.storage.scan(self.directory)
+
+    def tearDown(self) -> None:
+        rmtree(self.directory)
+
+    def test_scan_only_visible_files(self):
+        self.assertEqual(2, self.storage.amount_of_files)
+        self.assertTrue(self.storage.exists(f'{self.directory}/a.png'))
+        self.assertFalse(self.storage.exists(f'{self.directory}/.1.part'))
+
+    @async_test
+    async def test_write_chunks_and_commit_temp_file(self):
+        temp_path = f'{self.directory}/.2.part'
+        async with self.storage.open_for_write(temp_path) as writer:
+            await writer.write(b'first ')
+            await writer.write(b'second')
+        saved = await self.storage.commit(temp_path, f'{self.directory}/c.png')
+        await self.storage.close()
+
+        self.assertTrue(saved)
+        self.assertTrue(self.storage.exists(f'{self.directory}/c.png'))
+        self.assertFalse(path.exists(temp_path))
+        with open(f'{self.directory}/c.png', 'rb') as file:
+            self.assertEqual(b'first second', file.read())
+
+    @async_test
+    async def test_discard_temp_file_when_file_already_exists(self):
+        saved = await self.storage.commit(f'{self.directory}/.1.part', f'{self.directory}/a.png')
+        await self.storage.close()
+        self.assertFalse(saved)
+        self.assertEqual(['.index.sqlite3', 'a.png', 'b.jpeg'], sorted(listdir(self.directory)))
+
+    @async_test
+    async def test_keep_file_written_by_another_process_after_scan(self):
+        with open(f'{self.directory}/c.png', 'wb') as file:
+            file.write(b'other process')
+        saved = await self.storage.commit(f'{self.directory}/.1.part', f'{self.directory}/c.png')
+        await self.storage.close()
+        self.assertFalse(saved)
+        self.assertFalse(path.exists(f'{self.directory}/.1.part'))
+        with open(f'{self.directory}/c.png', 'rb') as file:
+            self.assertEqual(b'other process', file.read())
+
+    @patch('os.link', side_effect=OSError(errno.EOPNOTSUPP, 'Operation not supported'))
+    @async_test
+    async def test_replace_temp_file_when_hard_links_are_not_supported(self, mock_link):
+        saved = await self.storage.commit(f'{self.directory}/.1.part', f'{self.directory}/c.png')
+        await self.storage.close()
+        self.assertTrue(saved)
+        self.assertEqual(['.index.sqlite3', 'a.png', 'b.jpeg', 'c.png'], sorted(listdir(self.directory)))
+
+    def test_scan_sharded_directories_except_excluded_ones(self):
+        makedirs(f'{self.directory}/ab/cd')
+        makedirs(f'{self.directory}/by-id')
+        for file_path in ('ab/cd/e.png', 'by-id/1.png'):
+            with open(f'{self.directory}/{file_path}', 'wb') as file:
+                file.write(b'content')
+        self.storage.scan(self.directory, excluded_directories=('by-id',))
+        self.assertEqual(3, self.storage.amount_of_files)
+        self.assertTrue(self.storage.exists(f'{self.directory}/ab/cd/e.png'))
+        self.assertFalse(self.storage.exists(f'{self.directory}/by-id/1.png'))
+
+    @async_test
+    async def test_commit_into_missing_subdirectory_and_link_it(self):
+        file_path = f'{self.directory}/ab/cd/c.png'
+        saved = await self.storage.commit(f'{self.directory}/.1.part', file_path)
+        await self.storage.link(file_path, f'{self.directory}/by-id/1.png')
+        await self.storage.link(file_path, f'{self.directory}/by-id/1.png')
+        await self.storage.close()
+        self.assertTrue(saved)
+        self.assertEqual(stat(file_path).st_ino, stat(f'{self.directory}/by-id/1.png').st_ino)
+        self.assertEqual(['1.png'], listdir(f'{self.directory}/by-id'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import io
+import logging
+import unittest
+
+from logging.handlers import QueueHandler
+
+from src.logging_config import configure_logging
+
+
+class TestConfigureLogging(unittest.TestCase):
+    def setUp(self) -> None:
+        self.root_logger = logging.getLogger()
+        self.handlers = list(self.root_logger.handlers)
+        self.level = self.root_logger.level
+        self.stream = io.StringIO()
+
+    def tearDown(self) -> None:
+        self.root_logger.handlers = self.handlers
+        self.root_logger.setLevel(self.level)
+
+    def test_write_formatted_records_to_stream(self):
+        logging_handle = configure_logging(logging.WARNING, stream=self.stream)
+        logging.info('Comic id: %s has been saved', 1)
+        logging.warning('Error %d in request for comic id image file: %s', 500, 1)
+        logging_handle.stop()
+        self.assertEqual(self.handlers, self.root_logger.handlers)
+        self.assertRegex(
+            self.stream.getvalue(),
+            r'^\[[^]]+\]\[WARNING\] Error 500 in request for comic id image file: 1\n$'
+        )
+
+    def test_write_records_through_queue_listener(self):
+        logging_handle = configure_logging(stream=self.stream, use_queue=True)
+        self.assertIsInstance(self.root_logger.handlers[-1], QueueHandler)
+        logging.info('Progress: %d comics saved', 10)
+        logging_handle.stop()
+        self.assertIn('[INFO] Progress: 10 comics saved\n', self.stream.getvalue())
+
+    def test_detach_handlers_of_each_call_when_stopped(self):
+        for _ in range(3):
+            configure_logging(stream=self.stream, use_queue=True).stop()
+        self.assertEqual(self.handlers, self.root_logger.handlers)
@@ -0,0 +1,22 @@
+import asyncio
+import time
+import unittest
+
+from src.loop_monitor import LoopLagMonitor
+from src.metrics import Metrics
+from src.test.src.test_xkcd_async_downloader import async_test
+
+
+class TestLoopLagMonitor(unittest.TestCase):
+    @async_test
+    async def test_observe_lag_when_loop_is_blocked(self):
+        metrics = Metrics()
+        monitor = LoopLagMonitor(metrics, interval=0.01)
+        monitor.start()
+        await asyncio.sleep(0)
+        time.sleep(0.05)
+        await asyncio.sleep(0.02)
+        monitor.stop()
+        histogram = metrics.get_histogram('event_loop_lag_seconds')
+        self.assertGreaterEqual(histogram.count, 1)
+        self.assertGreaterEqual(histogram.get_percentile(100), 0.03)
@@ -0,0 +1,72 @@
+import gzip
+import unittest
+
+from os import listdir, path
+from shutil import rmtree
+
+from src.metadata_export import MetadataWriter, append_metadata_file, iter_metadata
+
+
+class TestMetadataExport(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = 'directory_of_test'
+        self.comics = [
+            {'num': comic_id, 'title': f'Comic {comic_id}', 'alt': 'Ação'} for comic_id in range(1, 6)
+        ]
+
+    def tearDown(self) -> None:
+        rmtree(self.directory, ignore_errors=True)
+
+    def write_comics(self, file_path: str, batch_size: int = 2) -> MetadataWriter:
+        writer = MetadataWriter(file_path, batch_size)
+        for comic in self.comics:
+            writer.write(comic)
+        return writer
+
+    def test_buffer_lines_until_batch_is_full(self):
+        file_path = f'{self.directory}/metadata/comics.ndjson'
+        writer = self.write_comics(file_path, batch_size=3)
+        self.assertEqual(self.comics[:3], list(iter_metadata(file_path)))
+        writer.flush()
+        self.assertEqual(5, writer.written)
+        self.assertEqual(self.comics, list(iter_metadata(file_path)))
+
+    def test_write_and_read_gzip_compressed_lines(self):
+        file_path = f'{self.directory}/comics.ndjson.gz'
+        self.write_comics(file_path).flush()
+        with gzip.open(file_path, 'rt', encoding='utf-8') as file:
+            self.assertEqual('{"num":1,"title":"Comic 1","alt":"Ação"}\n', file.readline())
+        self.assertEqual(self.comics, list(iter_metadata(file_path)))
+
+    def test_append_shard_file_to_compressed_file(self):
+        file_path = f'{self.directory}/comics.ndjson.gz'
+        shard_file_path = f'{self.directory}/.shard-0.comics.ndjson.gz'
+        self.write_comics(file_path).flush()
+        self.write_comics(shard_file_path).flush()
+        append_metadata_file(shard_file_path, file_path)
+        self.assertEqual(self.comics * 2, list(iter_metadata(file_path, latest_only=False)))
+        self.assertEqual(self.comics, list(iter_metadata(file_path)))
+        self.assertEqual(['comics.ndjson.gz'], listdir(self.directory))
+
+    def test_yield_only_latest_line_of_each_comic(self):
+        file_path = f'{self.directory}/comics.ndjson'
+        writer = self.write_comics(file_path)
+        writer.write({'num': 2, 'title': 'Comic 2 (refreshed)'})
+        writer.flush()
+        self.assertEqual([1, 3, 4, 5, 2], [comic['num'] for comic in iter_metadata(file_path)])
+        self.assertEqual('Comic 2 (refreshed)', list(iter_metadata(file_path))[-1]['title'])
+        self.assertEqual(6, len(list(iter_metadata(file_path, latest_only=False))))
+
+    def test_stop_reading_at_torn_last_line(self):
+        file_path = f'{self.directory}/comics.ndjson'
+        self.write_comics(file_path).flush()
+        with open(file_path, 'a') as file:
+            file.write('{"num": 6, "tit')
+        self.assertEqual(self.comics, list(iter_metadata(file_path)))
+
+    def test_ignore_comics_when_path_is_not_set(self):
+        writer = MetadataWriter()
+        writer.write(self.comics[0])
+        writer.flush()
+        self.assertEqual(0, writer.written)
+        self.assertFalse(path.exists(self.directory))
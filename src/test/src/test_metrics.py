@@ -0,0 +1,95 @@
+import json
+import os
+import tempfile
+import unittest
+
+from src.metrics import Histogram, Metrics, write_text_atomically
+
+
+class TestHistogram(unittest.TestCase):
+    def test_count_observations_in_buckets_and_percentiles(self):
+        histogram = Histogram(buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 2.0):
+            histogram.observe(value)
+        self.assertEqual([1, 2, 1], histogram.bucket_counts)
+        self.assertEqual(0.5, histogram.get_percentile(50))
+        self.assertEqual(2.0, histogram.get_percentile(99))
+        self.assertEqual({'count': 4, 'sum': 3.05, 'p50': 0.5, 'p95': 2.0, 'p99': 2.0}, histogram.summary())
+
+    def test_return_zero_percentile_without_observations(self):
+        self.assertEqual(0.0, Histogram().get_percentile(95))
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self) -> None:
+        self.metrics = Metrics(prefix='test')
+
+    def test_increment_counters_by_labels(self):
+        self.metrics.increment('retries_total', error_class='timeout')
+        self.metrics.increment('retries_total', 2, error_class='timeout')
+        self.metrics.increment('retries_total', error_class='throttled')
+        self.assertEqual(3, self.metrics.get_counter('retries_total', error_class='timeout'))
+        self.assertEqual(1, self.metrics.get_counter('retries_total', error_class='throttled'))
+        self.assertEqual(0, self.metrics.get_counter('bytes_total'))
+        self.assertEqual(4, self.metrics.get_counter_total('retries_total'))
+        self.assertEqual(0, self.metrics.get_counter_total('bytes_total'))
+
+    def test_export_json_summary(self):
+        self.metrics.increment('requests_total')
+        self.metrics.increment('skips_total', reason='indexed')
+        self.metrics.observe('api_latency_seconds', 0.2)
+        self.metrics.register_gauge('image_queue_depth', lambda: 3)
+        self.assertEqual({
+            'counters': {'requests_total': {'total': 1}, 'skips_total': {'{reason="indexed"}': 1}},
+            'histograms': {
+                'api_latency_seconds': {'count': 1, 'sum': 0.2, 'p50': 0.2, 'p95': 0.2, 'p99': 0.2}
+            },
+            'gauges': {'image_queue_depth': 3},
+        }, json.loads(self.metrics.to_json()))
+
+    def test_export_prometheus_text(self):
+        self.metrics.increment('errors_total', stage='api', type='http_500')
+        self.metrics.observe('hash_seconds', 0.003)
+        self.metrics.register_gauge('in_flight_requests', lambda: 2)
+        text = self.metrics.to_prometheus()
+        self.assertIn('# TYPE test_errors_total counter\n', text)
+        self.assertIn('test_errors_total{stage="api",type="http_500"} 1', text)
+        self.assertIn('test_hash_seconds_bucket{le="0.005"} 1\n', text)
+        self.assertIn('test_hash_seconds_bucket{le="0.001"} 0\n', text)
+        self.assertIn('test_hash_seconds_count 1\n', text)
+        self.assertIn('test_in_flight_requests 2\n', text)
+
+    def test_export_gauges_with_labels(self):
+        self.metrics.register_gauge('rate_limit', lambda: 20.0, source='xkcd')
+        self.metrics.register_gauge('rate_limit', lambda: 10.0, source='mirror')
+        gauges = self.metrics.to_dict()['gauges']
+        self.assertEqual({'{source="mirror"}': 10.0, '{source="xkcd"}': 20.0}, gauges['rate_limit'])
+        self.assertIn('test_rate_limit{source="xkcd"} 20.0\n', self.metrics.to_prometheus())
+
+        self.metrics.remove_gauge('rate_limit')
+        self.assertEqual({}, self.metrics.to_dict()['gauges'])
+
+    def test_merge_snapshot_of_another_registry(self):
+        shard_metrics = Metrics(prefix='test')
+        shard_metrics.increment('saved_files_total', 2)
+        shard_metrics.increment('retries_total', error_class='timeout')
+        shard_metrics.observe('api_latency_seconds', 0.5)
+        self.metrics.increment('saved_files_total')
+        self.metrics.observe('api_latency_seconds', 0.1)
+        self.metrics.merge(shard_metrics.snapshot())
+        self.assertEqual(3, self.metrics.get_counter('saved_files_total'))
+        self.assertEqual(1, self.metrics.get_counter('retries_total', error_class='timeout'))
+        histogram = self.metrics.get_histogram('api_latency_seconds')
+        self.assertEqual(2, histogram.count)
+        self.assertEqual(0.5, histogram.get_percentile(99))
+
+
+class TestWriteTextAtomically(unittest.TestCase):
+    def test_replace_file_without_leaving_temporary_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'metrics.prom')
+            write_text_atomically(file_path, 'old')
+            write_text_atomically(file_path, 'new')
+            with open(file_path) as file:
+                self.assertEqual('new', file.read())
+            self.assertEqual(['metrics.prom'], os.listdir(directory))
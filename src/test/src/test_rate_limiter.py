@@ -0,0 +1,115 @@
+import asyncio
+import time
+import unittest
+
+from unittest.mock import MagicMock
+
+from aiohttp import ClientPayloadError
+
+from src.rate_limiter import AdaptiveRateLimiter, RateLimitedSession, TokenBucket
+from src.test.src.test_xkcd_async_downloader import MockResponse, async_test
+
+
+class TestTokenBucket(unittest.TestCase):
+    @async_test
+    async def test_limit_requests_to_rate_after_burst(self):
+        bucket = TokenBucket(rate=100.0, capacity=1.0)
+        started = time.monotonic()
+        for _ in range(6):
+            await bucket.take()
+        self.assertGreaterEqual(time.monotonic() - started, 0.04)
+
+
+class TestAdaptiveRateLimiter(unittest.TestCase):
+    def setUp(self) -> None:
+        self.limiter = AdaptiveRateLimiter(
+            rate=1000.0, max_rate=2000.0, limit=4, max_limit=8, window_size=5
+        )
+
+    @async_test
+    async def test_increase_limit_and_rate_additively_when_latency_is_stable(self):
+        for _ in range(5):
+            await self.limiter.acquire()
+            self.limiter.release(0.1, 200)
+        self.assertEqual({'rate': 1005.0, 'limit': 5, 'in_flight': 0}, self.limiter.metrics)
+
+    @async_test
+    async def test_decrease_limit_and_rate_multiplicatively_when_throttled(self):
+        await self.limiter.acquire()
+        self.limiter.release(0.1, 429)
+        self.assertEqual({'rate': 500.0, 'limit': 2, 'in_flight': 0}, self.limiter.metrics)
+
+    @async_test
+    async def test_decrease_at_most_once_per_window_of_responses(self):
+        for _ in range(5):
+            await self.limiter.acquire()
+            self.limiter.release(0.1, 429)
+        self.assertEqual(2, self.limiter.limit)
+        await self.limiter.acquire()
+        self.limiter.release(0.1, 503)
+        self.assertEqual(1, self.limiter.limit)
+
+    @async_test
+    async def test_decrease_limit_when_p95_latency_rises(self):
+        for latency in [0.1] * 5 + [1.0] * 5:
+            await self.limiter.acquire()
+            self.limiter.release(latency, 200)
+        self.assertEqual(2, self.limiter.limit)
+
+    @async_test
+    async def test_never_exceed_current_limit(self):
+        max_in_flight = 0
+
+        async def request():
+            nonlocal max_in_flight
+            await self.limiter.acquire()
+            max_in_flight = max(max_in_flight, self.limiter.in_flight)
+            await asyncio.sleep(0.001)
+            self.limiter.release(0.001, 429)
+
+        await asyncio.gather(*[request() for _ in range(12)])
+        self.assertEqual(4, max_in_flight)
+        self.assertEqual(0, self.limiter.in_flight)
+
+
+class TestRateLimitedSession(unittest.TestCase):
+    @async_test
+    async def test_delegate_request_and_record_response_status(self):
+        limiter = AdaptiveRateLimiter(rate=1000.0, max_rate=1000.0, limit=4, max_limit=4)
+        session = MagicMock()
+        session.request.return_value = MockResponse(status=503)
+        response = await RateLimitedSession(session, limiter).request('GET', 'https://xkcd.com', headers={})
+        session.request.assert_called_once_with('GET', 'https://xkcd.com', headers={})
+        self.assertEqual(503, response.status)
+        self.assertEqual(2, limiter.limit)
+
+    @async_test
+    async def test_hold_slot_until_body_has_been_read(self):
+        limiter = AdaptiveRateLimiter(rate=1000.0, max_rate=1000.0, limit=4, max_limit=4)
+        session = MagicMock()
+        session.request.return_value = MockResponse(read=b'image')
+        in_flight_while_reading = []
+
+        async def read_body(response):
+            in_flight_while_reading.append(limiter.in_flight)
+            return await response.read()
+
+        _, body = await RateLimitedSession(session, limiter).fetch('GET', 'https://xkcd.com', read_body)
+        self.assertEqual(b'image', body)
+        self.assertEqual([1], in_flight_while_reading)
+        self.assertEqual(0, limiter.in_flight)
+
+    @async_test
+    async def test_release_slot_and_response_when_body_can_not_be_read(self):
+        limiter = AdaptiveRateLimiter(rate=1000.0, max_rate=1000.0, limit=4, max_limit=4)
+        response = await MockResponse(read=b'image', error=ClientPayloadError)
+        session = MagicMock()
+        session.request.return_value = response
+        with self.assertRaises(ClientPayloadError):
+            await RateLimitedSession(session, limiter).fetch('GET', 'https://xkcd.com', lambda r: r.read())
+        self.assertTrue(response.released)
+        self.assertEqual(0, limiter.in_flight)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import asyncio
+import unittest
+
+from aiohttp import ClientConnectionError, ClientPayloadError
+
+from src.retry_policy import RetryPolicy, get_error_class, parse_retry_after
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def setUp(self) -> None:
+        self.policy = RetryPolicy(attempts=5, base_delay=1.0, max_delay=5.0, jitter=0.5)
+
+    def test_delay_grows_exponentially_with_jitter(self):
+        for attempt, backoff in [(1, 1.0), (2, 2.0), (3, 4.0)]:
+            delay = self.policy.get_delay(attempt)
+            self.assertGreaterEqual(delay, backoff * 0.5)
+            self.assertLessEqual(delay, backoff)
+
+    def test_delay_is_capped_by_max_delay(self):
+        self.assertLessEqual(self.policy.get_delay(10), 5.0)
+
+    def test_delay_follows_retry_after_header_capped_by_max_delay(self):
+        self.assertEqual(3.0, self.policy.get_delay(1, '3'))
+        self.assertEqual(5.0, self.policy.get_delay(1, '120'))
+
+
+class TestGetErrorClass(unittest.TestCase):
+    def test_classify_exceptions(self):
+        self.assertEqual('timeout', get_error_class(exception=asyncio.TimeoutError()))
+        self.assertEqual('connection', get_error_class(exception=ClientConnectionError()))
+        self.assertEqual('connection', get_error_class(exception=ConnectionResetError()))
+        self.assertEqual('connection', get_error_class(exception=ClientPayloadError()))
+        self.assertIsNone(get_error_class(exception=ValueError()))
+
+    def test_classify_status_codes(self):
+        self.assertEqual('throttled', get_error_class(status=429))
+        self.assertEqual('throttled', get_error_class(status=503))
+        self.assertEqual('server_error', get_error_class(status=500))
+        self.assertIsNone(get_error_class(status=404))
+        self.assertIsNone(get_error_class(status=200))
+
+
+class TestParseRetryAfter(unittest.TestCase):
+    def test_parse_seconds(self):
+        self.assertEqual(7.0, parse_retry_after('7'))
+
+    def test_parse_past_http_date_as_zero(self):
+        self.assertEqual(0.0, parse_retry_after('Wed, 09 Feb 2022 17:43:21 GMT'))
+
+    def test_return_none_when_header_is_missing_or_invalid(self):
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after('soon'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+
+from os import listdir
+
+from src.comic_index import ComicIndex
+from src.comic_source import ComicSource
+from src.metadata_export import iter_metadata
+from src.sharding import get_importable_class, get_shard_settings, split_comic_ids
+from src.test.src.test_benchmark_stub_server import StubServerTestCase
+from src.xkcd_async_downloader import XkcdAsyncDownloader
+
+
+class TestSplitComicIds(unittest.TestCase):
+    def test_interleave_comic_ids_across_shards(self):
+        self.assertEqual([[1, 4, 7], [2, 5], [3, 6]], split_comic_ids(range(1, 8), 3))
+
+    def test_return_empty_shards_when_there_are_more_shards_than_ids(self):
+        self.assertEqual([[1], []], split_comic_ids([1], 2))
+
+
+class TestGetShardSettings(unittest.TestCase):
+    def test_split_rate_limit_and_use_own_index_file(self):
+        downloader_class = type('CustomDownloader', (XkcdAsyncDownloader,), {'DIRECTORY': 'custom'})
+        settings = get_shard_settings(downloader_class, 1, 4)
+        self.assertEqual('custom', settings['DIRECTORY'])
+        self.assertEqual('.index-shard-1.sqlite3', settings['INDEX_FILE'])
+        self.assertEqual(XkcdAsyncDownloader.RATE_LIMIT / 4, settings['RATE_LIMIT'])
+        self.assertEqual(XkcdAsyncDownloader.MAX_RATE_LIMIT / 4, settings['MAX_RATE_LIMIT'])
+        self.assertIsNone(settings['METRICS_FILE'])
+        self.assertEqual(1, settings['SHARDS'])
+
+    def test_use_settings_overridden_on_instance(self):
+        downloader = XkcdAsyncDownloader()
+        downloader.DIRECTORY = 'instance_dir'
+        downloader.RATE_LIMIT = 8.0
+        settings = get_shard_settings(downloader, 0, 2)
+        self.assertEqual('instance_dir', settings['DIRECTORY'])
+        self.assertEqual(4.0, settings['RATE_LIMIT'])
+
+    def test_split_rate_limit_of_each_source(self):
+        downloader_class = type('CustomDownloader', (XkcdAsyncDownloader,), {
+            'SOURCES': (ComicSource('primary', rate_limit=40.0), ComicSource('mirror', max_rate_limit=20.0))
+        })
+        settings = get_shard_settings(downloader_class, 0, 2)
+        self.assertEqual(
+            [('primary', 20.0, 50.0), ('mirror', 10.0, 10.0)],
+            [(source.name, source.rate_limit, source.max_rate_limit) for source in settings['SOURCES']]
+        )
+
+
+class TestGetImportableClass(unittest.TestCase):
+    def test_return_nearest_importable_base_of_dynamic_class(self):
+        downloader_class = type('CustomDownloader', (XkcdAsyncDownloader,), {})
+        self.assertIs(XkcdAsyncDownloader, get_importable_class(downloader_class))
+        self.assertIs(XkcdAsyncDownloader, get_importable_class(XkcdAsyncDownloader))
+
+
+class TestShardedDownload(StubServerTestCase):
+    def test_download_every_comic_once_with_sharded_processes(self):
+        with self.assertLogs() as captured_log:
+            downloader = self.create_downloader()
+            downloader.make_download(shards=2)
+
+        self.assertEqual(20, len(self.get_saved_files()))
+        self.assertEqual(20, downloader.get_amout_of_saved_files)
+        self.assertEqual(20, downloader.metrics.get_counter('saved_files_total'))
+        self.assertTrue(any(
+            'Sharded mode: 20 comics split across 2 processes' in line for line in captured_log.output
+        ))
+        self.assertFalse(any(name.startswith('.index-shard-') for name in listdir(self.directory)))
+        self.assertEqual(['comics.ndjson'], listdir(f'{self.directory}/metadata'))
+        metadata = iter_metadata(f'{self.directory}/metadata/comics.ndjson')
+        self.assertEqual(list(range(1, 21)), sorted(comic['num'] for comic in metadata))
+
+        index = ComicIndex()
+        index.open(f'{self.directory}/.index.sqlite3')
+        try:
+            self.assertEqual(set(range(1, 21)), index.completed_ids())
+            self.assertEqual(20, index.get_last_crawled_id())
+        finally:
+            index.close()
@@ -0,0 +1,60 @@
+import unittest
+
+from hashlib import md5
+from os import listdir, makedirs, path, readlink, stat
+from shutil import rmtree
+
+from src.blob_layout import BlobLayout
+from src.comic_index import ComicIndex, ComicRecord
+from src.storage_migration import migrate_directory
+
+
+class TestMigrateDirectory(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = 'directory_of_test'
+        makedirs(self.directory)
+        self.hashes = []
+        for content in (b'first', b'second'):
+            file_hash = md5(content).hexdigest()
+            self.hashes.append(file_hash)
+            with open(f'{self.directory}/{file_hash}.png', 'wb') as file:
+                file.write(content)
+        index = ComicIndex()
+        index.open(f'{self.directory}/.index.sqlite3')
+        for comic_id, file_hash in ((1, self.hashes[0]), (2, self.hashes[1]), (3, self.hashes[0])):
+            index.add(ComicRecord(comic_id, '', file_hash, 'png', 5))
+        index.close()
+
+    def tearDown(self) -> None:
+        rmtree(self.directory)
+
+    def get_blob_path(self, file_hash: str) -> str:
+        return f'{self.directory}/{file_hash[:2]}/{file_hash[2:4]}/{file_hash}.png'
+
+    def test_move_flat_files_to_sharded_directories(self):
+        summary = migrate_directory(self.directory, BlobLayout(sharded=True))
+        self.assertEqual(
+            {'moved_files': 2, 'duplicated_files': 0, 'linked_comics': 0, 'shared_blobs': 1}, summary
+        )
+        for file_hash in self.hashes:
+            self.assertTrue(path.isfile(self.get_blob_path(file_hash)))
+        self.assertEqual(
+            sorted(['.index.sqlite3'] + [file_hash[:2] for file_hash in self.hashes]),
+            sorted(listdir(self.directory))
+        )
+
+    def test_create_hardlink_per_comic_id(self):
+        summary = migrate_directory(self.directory, BlobLayout(sharded=True, links='hardlink'))
+        self.assertEqual(3, summary['linked_comics'])
+        blob_inode = stat(self.get_blob_path(self.hashes[0])).st_ino
+        self.assertEqual(blob_inode, stat(f'{self.directory}/by-id/1.png').st_ino)
+        self.assertEqual(blob_inode, stat(f'{self.directory}/by-id/3.png').st_ino)
+
+    def test_create_relative_symlink_per_comic_id(self):
+        migrate_directory(self.directory, BlobLayout(sharded=True, links='symlink'))
+        file_hash = self.hashes[1]
+        self.assertEqual(
+            f'../{file_hash[:2]}/{file_hash[2:4]}/{file_hash}.png', readlink(f'{self.directory}/by-id/2.png')
+        )
+        with open(f'{self.directory}/by-id/2.png', 'rb') as file:
+            self.assertEqual(b'second', file.read())
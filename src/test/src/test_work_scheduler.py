@@ -0,0 +1,66 @@
+import asyncio
+import unittest
+
+from src.test.src.test_xkcd_async_downloader import async_test
+from src.work_scheduler import WorkScheduler
+
+
+class TestWorkScheduler(unittest.TestCase):
+    def setUp(self) -> None:
+        self.handled_items = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def handler(self, item: int) -> None:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.001)
+        self.handled_items.append(item)
+        self.in_flight -= 1
+
+    @async_test
+    async def test_handle_every_item(self):
+        await WorkScheduler(self.handler, 4).run(range(1, 51))
+        self.assertEqual(list(range(1, 51)), sorted(self.handled_items))
+
+    @async_test
+    async def test_never_exceed_concurrency_limit(self):
+        await WorkScheduler(self.handler, 3).run(range(30))
+        self.assertEqual(3, self.max_in_flight)
+
+    @async_test
+    async def test_block_producer_when_queue_is_full(self):
+        release = asyncio.Event()
+
+        async def blocked_handler(item: int) -> None:
+            await release.wait()
+            self.handled_items.append(item)
+
+        scheduler = WorkScheduler(blocked_handler, 1, queue_size=1)
+        scheduler.start()
+        await scheduler.put(1)
+        await scheduler.put(2)
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(scheduler.put(3), 0.01)
+        release.set()
+        await scheduler.join()
+        await scheduler.stop()
+        self.assertEqual([1, 2], self.handled_items)
+
+    @async_test
+    async def test_display_error_log_and_keep_working_when_handler_raises(self):
+        async def failing_handler(item: int) -> None:
+            if item == 2:
+                raise ValueError
+            self.handled_items.append(item)
+
+        with self.assertLogs() as captured_log:
+            await WorkScheduler(failing_handler, 2).run(range(1, 5))
+        self.assertEqual(
+            captured_log.output[0], 'ERROR:root:Error ValueError in scheduled task for item: 2'
+        )
+        self.assertEqual([1, 3, 4], sorted(self.handled_items))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,15 +1,27 @@
 import asyncio
 import json
+import threading
 import unittest
 
-from os import path, rmdir, remove
+from os import path, readlink, rmdir, remove
+from shutil import rmtree
 from time import sleep
-from unittest.mock import patch
+from typing import Optional
+from unittest.mock import MagicMock, patch
 
+from aiohttp import ClientPayloadError
 from aiohttp.client import ClientSession
 from async_class import AsyncClass
 from http.client import InvalidURL
-
+from json import dumps
+from multidict import CIMultiDict, CIMultiDictProxy
+
+from src.blob_layout import BlobLayout
+from src.comic_index import ComicIndex, ComicRecord
+from src.comic_source import ComicSource, SourceClient, SourcePool
+from src.local_storage import LocalStorage
+from src.metadata_export import MetadataWriter
+from src.retry_policy import RetryPolicy
 from src.xkcd_async_downloader import XkcdAsyncDownloader
 
 
@@ -22,13 +34,29 @@ def async_test(coroutine):
     return wrapped
 
 
+class MockStreamReader:
+    def __init__(self, content: bytes, error: Optional[type] = None) -> None:
+        self.content = content
+        self.error = error
+
+    async def iter_chunked(self, size: int):
+        for start in range(0, len(self.content), size):
+            sleep(0)
+            yield self.content[start:start + size]
+        if self.error:
+            raise self.error
+
+
 class MockResponse(AsyncClass):
     async def __ainit__(self, status: int = 200, json: dict = {}, read: bytes = b'',
-                        headers: dict = {}) -> None:
+                        headers: dict = {}, error: Optional[type] = None) -> None:
         self.status = status
-        self.headers = headers
+        self.headers = CIMultiDictProxy(CIMultiDict(headers))
         self.json_content = json
-        self.read_content = read
+        self.read_content = read or (dumps(json).encode() if json else b'')
+        self.content = MockStreamReader(read, error)
+        self.error = error
+        self.released = False
 
     async def json(self):
         sleep(0)
@@ -36,8 +64,19 @@ class MockResponse(AsyncClass):
 
     async def read(self):
         sleep(0)
+        if self.error:
+            raise self.error
         return self.read_content
 
+    def release(self):
+        self.released = True
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
 
 def get_api_json_fixture() -> dict:
     with open('src/test/src/fixtures/api_content_file.json') as file:
@@ -114,53 +153,73 @@ class TestSaveFileInLocalStorage(unittest.TestCase):
     def setUp(self) -> None:
         self.instance = XkcdAsyncDownloader()
         self.instance.DIRECTORY = '.'
-        self.file_data = {'content': get_img_file_binary_content(), 'extension': 'png'}
         self.comic_id = 2579
-        self.md5_img_name_file = '2f00e94162e4023b0270a3f309588075.png'
+        self.md5_hash = '2f00e94162e4023b0270a3f309588075'
+        self.md5_img_name_file = f'{self.md5_hash}.png'
         self.file_path = f'{self.instance.DIRECTORY}/{self.md5_img_name_file}'
+        self.temp_path = f'{self.instance.DIRECTORY}/.{self.comic_id}.part'
+        with open(self.temp_path, 'wb') as file:
+            file.write(get_img_file_binary_content())
 
     def tearDown(self) -> None:
-        try:
-            remove(self.md5_img_name_file)
-        except FileNotFoundError:
-            pass
+        for file_path in (self.md5_img_name_file, self.temp_path):
+            try:
+                remove(file_path)
+            except FileNotFoundError:
+                pass
 
     @async_test
-    async def test_create_file_named_with_md5__display_info_log__increment_count_atribute__return_true(self):
-        with self.assertLogs() as captured_log:
+    async def test_create_file_named_with_md5__display_debug_log__increment_count_atribute__return_hash(self):
+        with self.assertLogs(level='DEBUG') as captured_log:
             captured_return = await self.instance._XkcdAsyncDownloader__save_file_in_local_storage(
-                self.comic_id, self.file_data['content'], self.file_data['extension']
+                self.comic_id, self.temp_path, self.md5_hash, 'png'
             )
         self.assertTrue(path.isfile(self.md5_img_name_file))
+        self.assertFalse(path.isfile(self.temp_path))
         self.assertEqual(
             captured_log.output[0],
-            f'INFO:root:Comic id: {self.comic_id} has been saved with name: {self.md5_img_name_file}'
+            f'DEBUG:root:Comic id: {self.comic_id} has been saved with name: {self.md5_img_name_file}'
         )
         self.assertEqual(1, self.instance._XkcdAsyncDownloader__count_of_saved_files)
-        self.assertTrue(captured_return)
+        self.assertEqual(self.md5_hash, captured_return)
 
-    @patch('os.path.isfile', return_value=True)
     @async_test
-    async def test_display_info_log_msg_when_file_already_exists_and_return_none(self, mock_open):
-        with self.assertLogs() as captured_log:
+    async def test_save_file_in_sharded_layout_and_link_comic_id(self):
+        self.instance.BLOB_LAYOUT = BlobLayout(sharded=True, links='symlink')
+        try:
+            captured_return = await self.instance._XkcdAsyncDownloader__save_file_in_local_storage(
+                self.comic_id, self.temp_path, self.md5_hash, 'png'
+            )
+            self.assertEqual(self.md5_hash, captured_return)
+            self.assertTrue(path.isfile(f'./2f/00/{self.md5_img_name_file}'))
+            self.assertEqual(f'../2f/00/{self.md5_img_name_file}', readlink(f'./by-id/{self.comic_id}.png'))
+        finally:
+            rmtree('./2f', ignore_errors=True)
+            rmtree('./by-id', ignore_errors=True)
+
+    @patch.object(LocalStorage, 'exists', return_value=True)
+    @async_test
+    async def test_display_debug_log_msg_when_file_already_exists_and_return_hash(self, mock_exists):
+        with self.assertLogs(level='DEBUG') as captured_log:
             captured_return = await self.instance._XkcdAsyncDownloader__save_file_in_local_storage(
-                self.comic_id, self.file_data['content'], self.file_data['extension']
+                self.comic_id, self.temp_path, self.md5_hash, 'png'
             )
         self.assertEqual(
             captured_log.output[0],
-            f'INFO:root:File of comic id: {self.comic_id} already exits with name: {self.md5_img_name_file}'
+            f'DEBUG:root:File of comic id: {self.comic_id} already exits with name: {self.md5_img_name_file}'
         )
-        self.assertIsNone(captured_return)
+        self.assertEqual(self.md5_hash, captured_return)
+        self.assertFalse(path.exists(self.temp_path))
 
-    @patch('aiofiles.open')
+    @patch('os.link')
     @async_test
-    async def test_display_error_log_msg_when_exceptions_are_raised_and_return_none(self, mock_open):
+    async def test_display_error_log_msg_when_exceptions_are_raised_and_return_none(self, mock_link):
         known_exceptions = [IsADirectoryError, PermissionError, FileNotFoundError]
         for exception in known_exceptions:
-            mock_open.side_effect = exception
+            mock_link.side_effect = exception
             with self.assertLogs() as captured_log:
                 captured_return = await self.instance._XkcdAsyncDownloader__save_file_in_local_storage(
-                    self.comic_id, self.file_data['content'], self.file_data['extension']
+                    self.comic_id, self.temp_path, self.md5_hash, 'png'
                 )
             self.assertEqual(
                 captured_log.output[0],
@@ -173,6 +232,7 @@ class TestSaveFileInLocalStorage(unittest.TestCase):
 class TestGetLastIndex(unittest.TestCase):
     def setUp(self) -> None:
         self.instance = XkcdAsyncDownloader()
+        self.instance.RETRY_POLICIES = {}
         self.expected_last_index = 2579
 
     @patch('aiohttp.client.ClientSession.request')
@@ -194,15 +254,28 @@ class TestGetLastIndex(unittest.TestCase):
     async def test_return_false_and_display_error_log_when_status_code_is_not_200(self, mock_iorequest):
         status_codes = [403, 404, 500]
         for code in status_codes:
-            mock_iorequest.return_value = MockResponse(status=code)
+            response = await MockResponse(status=code)
+            mock_iorequest.return_value = response
             with self.assertLogs() as captured_log:
                 method_return = await self.instance._XkcdAsyncDownloader__get_last_index(ClientSession())
             self.assertFalse(method_return)
+            self.assertTrue(response.released)
             self.assertEqual(
                 captured_log.output[0],
                 f'ERROR:root:Error {code} when getting last comic index from xkcd API'
             )
 
+    @patch('aiohttp.client.ClientSession.request')
+    @async_test
+    async def test_return_false_and_display_error_log_when_last_index_can_not_be_parsed(self, mock_iorequest):
+        mock_iorequest.return_value = MockResponse(json={'latest': 2579})
+        with self.assertLogs() as captured_log:
+            method_return = await self.instance._XkcdAsyncDownloader__get_last_index(ClientSession())
+        self.assertFalse(method_return)
+        self.assertEqual(
+            captured_log.output[0], 'ERROR:root:Error KeyError when parsing last comic index from xkcd API'
+        )
+
     @patch('aiohttp.client.ClientSession.request')
     @async_test
     async def test_return_last_index_and_display_info_log(self, mock_iorequest):
@@ -213,9 +286,60 @@ class TestGetLastIndex(unittest.TestCase):
         self.assertEqual(self.expected_last_index, method_return)
 
 
+class TestFetch(unittest.TestCase):
+    def setUp(self) -> None:
+        self.instance = XkcdAsyncDownloader()
+        self.instance.RETRY_POLICIES = {
+            'timeout': RetryPolicy(attempts=2, base_delay=0),
+            'throttled': RetryPolicy(attempts=3, base_delay=0),
+        }
+        self.url = 'https://xkcd.com/2579/info.0.json'
+
+    @patch('aiohttp.client.ClientSession.request')
+    @async_test
+    async def test_retry_throttled_response_and_return_success_response(self, mock_iorequest):
+        mock_iorequest.side_effect = [
+            MockResponse(status=429, headers={'Retry-After': '0'}), MockResponse(status=200)
+        ]
+        with self.assertLogs() as captured_log:
+            method_return, _ = await self.instance._XkcdAsyncDownloader__fetch(ClientSession(), self.url)
+        self.assertEqual(200, method_return.status)
+        self.assertEqual(
+            captured_log.output[0],
+            f'WARNING:root:Error 429 in request for url: {self.url}, retrying in 0.00s (attempt 1 of 3)'
+        )
+        self.assertEqual(2, self.instance.metrics.get_counter('requests_total'))
+        self.assertEqual(1, self.instance.metrics.get_counter('retries_total', error_class='throttled'))
+
+    @patch('aiohttp.client.ClientSession.request')
+    @async_test
+    async def test_return_last_response_when_attempts_are_exhausted(self, mock_iorequest):
+        mock_iorequest.side_effect = [MockResponse(status=429) for _ in range(3)]
+        method_return, _ = await self.instance._XkcdAsyncDownloader__fetch(ClientSession(), self.url)
+        self.assertEqual(429, method_return.status)
+        self.assertEqual(3, mock_iorequest.call_count)
+
+    @patch('aiohttp.client.ClientSession.request')
+    @async_test
+    async def test_raise_exception_when_attempts_are_exhausted(self, mock_iorequest):
+        mock_iorequest.side_effect = TimeoutError
+        with self.assertRaises(TimeoutError):
+            await self.instance._XkcdAsyncDownloader__fetch(ClientSession(), self.url)
+        self.assertEqual(2, mock_iorequest.call_count)
+
+    @patch('aiohttp.client.ClientSession.request')
+    @async_test
+    async def test_do_not_retry_errors_without_policy(self, mock_iorequest):
+        mock_iorequest.side_effect = [MockResponse(status=500)]
+        method_return, _ = await self.instance._XkcdAsyncDownloader__fetch(ClientSession(), self.url)
+        self.assertEqual(500, method_return.status)
+        self.assertEqual(1, mock_iorequest.call_count)
+
+
 class TestGetComicImageUrl(unittest.TestCase):
     def setUp(self) -> None:
         self.instance = XkcdAsyncDownloader()
+        self.instance.RETRY_POLICIES = {}
         self.image_url = 'https://imgs.xkcd.com/comics/tractor_beam.png'
         self.comic_id = 2579
         self.comic_title = 'Tractor Beam'
@@ -254,29 +378,105 @@ class TestGetComicImageUrl(unittest.TestCase):
 
     @patch('aiohttp.client.ClientSession.request')
     @async_test
-    async def test_return_image_url_and_info_log(self, mock_iorequest):
-        mock_iorequest.return_value = MockResponse(json=get_api_json_fixture())
-        with self.assertLogs() as captured_log:
+    async def test_return_image_url_with_validators_and_debug_log(self, mock_iorequest):
+        mock_iorequest.return_value = MockResponse(
+            json=get_api_json_fixture(), headers={'ETag': '"api-etag"'}
+        )
+        with self.assertLogs(level='DEBUG') as captured_log:
             method_return = await self.instance._XkcdAsyncDownloader__get_comic_image_url(
                 self.comic_id, ClientSession()
             )
         self.assertEqual(
             captured_log.output[0],
-            f'INFO:root:URL from image comic id: {self.comic_id}, title: {self.comic_title}, '
+            f'DEBUG:root:URL from image comic id: {self.comic_id}, title: {self.comic_title}, '
             'has been obtained from API'
         )
-        self.assertEqual(self.image_url, method_return)
+        self.assertEqual({
+            'image_url': self.image_url, 'etag': '"api-etag"', 'last_modified': None,
+            'metadata': get_api_json_fixture()
+        }, method_return)
+        self.assertEqual({'Accept-Encoding': 'gzip, deflate'}, mock_iorequest.call_args.kwargs['headers'])
+
+    @patch('aiohttp.client.ClientSession.request')
+    @async_test
+    async def test_return_false_and_count_error_when_api_data_can_not_be_parsed(self, mock_iorequest):
+        mock_iorequest.side_effect = [MockResponse(read=b'{"num": '), MockResponse(json={'num': 2579})]
+        for source, error in ((ComicSource(), 'JSONDecodeError'), (ComicSource(), 'KeyError')):
+            with self.assertLogs() as captured_log:
+                method_return = await self.instance._XkcdAsyncDownloader__get_comic_image_url(
+                    self.comic_id, ClientSession(), source=source
+                )
+            self.assertFalse(method_return)
+            self.assertEqual(
+                captured_log.output[0],
+                f'WARNING:root:Error {error} when parsing API data of comic id: {self.comic_id} from xkcd'
+            )
+            self.assertEqual(1, self.instance.metrics.get_counter('errors_total', stage='api', type=error))
+
+    @patch('aiohttp.client.ClientSession.request')
+    @async_test
+    async def test_request_api_again_when_reading_body_times_out(self, mock_iorequest):
+        self.instance.RETRY_POLICIES = {'timeout': RetryPolicy(attempts=2, base_delay=0)}
+        mock_iorequest.side_effect = [
+            MockResponse(json=get_api_json_fixture(), error=asyncio.TimeoutError),
+            MockResponse(json=get_api_json_fixture()),
+        ]
+        with self.assertLogs():
+            method_return = await self.instance._XkcdAsyncDownloader__get_comic_image_url(
+                self.comic_id, ClientSession()
+            )
+        self.assertEqual(self.image_url, method_return['image_url'])
+        self.assertEqual(2, self.instance.metrics.get_counter('requests_total'))
+        self.assertEqual(1, self.instance.metrics.get_counter('retries_total', error_class='timeout'))
+
+    @patch('aiohttp.client.ClientSession.request')
+    @async_test
+    async def test_send_validators_and_return_indexed_data_when_status_code_is_304(self, mock_iorequest):
+        record = ComicRecord(
+            self.comic_id, self.image_url, '2f00e94162e4023b0270a3f309588075', 'png', 79575,
+            api_etag='"api-etag"', api_last_modified='Wed, 09 Feb 2022 17:43:21 GMT'
+        )
+        mock_iorequest.return_value = MockResponse(status=304)
+        with self.assertLogs(level='DEBUG') as captured_log:
+            method_return = await self.instance._XkcdAsyncDownloader__get_comic_image_url(
+                self.comic_id, ClientSession(), record
+            )
+        self.assertEqual(
+            captured_log.output[0], f'DEBUG:root:API data of comic id: {self.comic_id} has not been modified'
+        )
+        self.assertEqual({
+            'image_url': self.image_url, 'etag': '"api-etag"',
+            'last_modified': 'Wed, 09 Feb 2022 17:43:21 GMT'
+        }, method_return)
+        self.assertEqual({
+            'Accept-Encoding': 'gzip, deflate', 'If-None-Match': '"api-etag"',
+            'If-Modified-Since': 'Wed, 09 Feb 2022 17:43:21 GMT'
+        }, mock_iorequest.call_args.kwargs['headers'])
 
 
 class TestGetImageFile(unittest.TestCase):
     def setUp(self) -> None:
         self.instance = XkcdAsyncDownloader()
+        self.instance.DIRECTORY = '.'
+        self.instance.CHUNK_SIZE = 1024
+        self.instance.RETRY_POLICIES = {}
         self.img_file_content = get_img_file_binary_content()
         self.comic_id = 2579
         self.image_url = 'https://imgs.xkcd.com/comics/tractor_beam.png'
-        self.image_file_data = {'content': get_img_file_binary_content(), 'extension': 'png'}
+        self.temp_path = f'./.{self.comic_id}.part'
+        self.image_file_data = {
+            'temp_path': self.temp_path, 'md5': '2f00e94162e4023b0270a3f309588075',
+            'size': len(self.img_file_content), 'extension': 'png', 'etag': '6203fd39-136d7',
+            'last_modified': 'Wed, 09 Feb 2022 17:43:21 GMT'
+        }
         self.headers = get_headers_img_file_fixture()
 
+    def tearDown(self) -> None:
+        try:
+            remove(self.temp_path)
+        except FileNotFoundError:
+            pass
+
     @patch('aiohttp.client.ClientSession.request')
     @async_test
     async def test_display_warning_log_and_return_false_when_exceptions_are_raised(self, mock_iorequest):
@@ -308,6 +508,9 @@ class TestGetImageFile(unittest.TestCase):
                 f'WARNING:root:Error {code} in request for comic id image file: {self.comic_id}'
             )
             self.assertFalse(method_return)
+            self.assertEqual(
+                1, self.instance.metrics.get_counter('errors_total', stage='image', type=f'http_{code}')
+            )
 
     @patch('aiohttp.client.ClientSession.request')
     @async_test
@@ -325,65 +528,336 @@ class TestGetImageFile(unittest.TestCase):
 
     @patch('aiohttp.client.ClientSession.request')
     @async_test
-    async def test_return_image_file_data(self, mock_iorequest):
+    async def test_stream_image_to_temp_file_and_return_image_file_data(self, mock_iorequest):
         mock_iorequest.return_value = MockResponse(read=self.img_file_content, headers=self.headers)
         method_return = await self.instance._XkcdAsyncDownloader__get_image_file(
             self.comic_id, self.image_url, ClientSession()
         )
         self.assertEqual(self.image_file_data, method_return)
+        with open(self.temp_path, 'rb') as file:
+            self.assertEqual(self.img_file_content, file.read())
+        metrics = self.instance.metrics
+        self.assertEqual(len(self.img_file_content), metrics.get_counter('bytes_total', stage='image'))
+        for name in ('image_latency_seconds', 'hash_seconds', 'write_seconds'):
+            self.assertEqual(1, metrics.get_histogram(name).count)
 
+    @patch('aiohttp.client.ClientSession.request')
+    @async_test
+    async def test_hash_temp_file_in_process_pool_when_cpu_executor_is_process(self, mock_iorequest):
+        downloader_class = type('ProcessDownloader', (XkcdAsyncDownloader,), {
+            'DIRECTORY': '.', 'CHUNK_SIZE': 1024, 'RETRY_POLICIES': {}, 'CPU_EXECUTOR': 'process'
+        })
+        instance = downloader_class()
+        mock_iorequest.return_value = MockResponse(read=self.img_file_content, headers=self.headers)
+        try:
+            method_return = await instance._XkcdAsyncDownloader__get_image_file(
+                self.comic_id, self.image_url, ClientSession()
+            )
+        finally:
+            instance._XkcdAsyncDownloader__cpu_executor.close()
+        self.assertEqual(self.image_file_data, method_return)
 
-class TestTaskOfDownloader(unittest.TestCase):
+    @patch('aiohttp.client.ClientSession.request')
+    @async_test
+    async def test_send_validators_and_return_not_modified_when_status_code_is_304(self, mock_iorequest):
+        record = ComicRecord(
+            self.comic_id, self.image_url, '2f00e94162e4023b0270a3f309588075', 'png', 79575,
+            '6203fd39-136d7', 'Wed, 09 Feb 2022 17:43:21 GMT'
+        )
+        mock_iorequest.return_value = MockResponse(status=304)
+        method_return = await self.instance._XkcdAsyncDownloader__get_image_file(
+            self.comic_id, self.image_url, ClientSession(), record
+        )
+        self.assertEqual({'not_modified': True}, method_return)
+        self.assertEqual({
+            'Accept-Encoding': 'identity', 'If-None-Match': '6203fd39-136d7',
+            'If-Modified-Since': 'Wed, 09 Feb 2022 17:43:21 GMT'
+        }, mock_iorequest.call_args.kwargs['headers'])
+        self.assertFalse(path.exists(self.temp_path))
+
+    @patch('aiohttp.client.ClientSession.request')
+    @async_test
+    async def test_do_not_send_validators_when_image_url_has_changed(self, mock_iorequest):
+        record = ComicRecord(
+            self.comic_id, 'https://imgs.xkcd.com/comics/old.png', '2f00e94162e4023b0270a3f309588075',
+            'png', 79575, '6203fd39-136d7'
+        )
+        mock_iorequest.return_value = MockResponse(read=self.img_file_content, headers=self.headers)
+        method_return = await self.instance._XkcdAsyncDownloader__get_image_file(
+            self.comic_id, self.image_url, ClientSession(), record
+        )
+        self.assertEqual(self.image_file_data, method_return)
+        self.assertEqual({'Accept-Encoding': 'identity'}, mock_iorequest.call_args.kwargs['headers'])
+
+    @patch('aiohttp.client.ClientSession.request')
+    @async_test
+    async def test_request_image_again_when_body_is_truncated(self, mock_iorequest):
+        self.instance.RETRY_POLICIES = {'connection': RetryPolicy(attempts=2, base_delay=0)}
+        mock_iorequest.side_effect = [
+            MockResponse(read=self.img_file_content[:100], headers=self.headers, error=ClientPayloadError),
+            MockResponse(read=self.img_file_content, headers=self.headers),
+        ]
+        with self.assertLogs():
+            method_return = await self.instance._XkcdAsyncDownloader__get_image_file(
+                self.comic_id, self.image_url, ClientSession()
+            )
+        self.assertEqual(self.image_file_data, method_return)
+        self.assertEqual(1, self.instance.metrics.get_counter('retries_total', error_class='connection'))
+
+    @patch('aiohttp.client.ClientSession.request')
+    @async_test
+    async def test_remove_temp_file_when_body_is_truncated_in_every_attempt(self, mock_iorequest):
+        self.instance.RETRY_POLICIES = {'connection': RetryPolicy(attempts=2, base_delay=0)}
+        mock_iorequest.side_effect = [
+            MockResponse(read=self.img_file_content[:100], headers=self.headers, error=ClientPayloadError)
+            for _ in range(2)
+        ]
+        with self.assertLogs() as captured_log:
+            method_return = await self.instance._XkcdAsyncDownloader__get_image_file(
+                self.comic_id, self.image_url, ClientSession()
+            )
+        self.assertFalse(method_return)
+        self.assertFalse(path.exists(self.temp_path))
+        self.assertIn(
+            f'WARNING:root:Error ClientPayloadError in request for comic id image file: {self.comic_id}',
+            captured_log.output
+        )
+
+    @patch.object(LocalStorage, 'open_for_write')
+    @patch('aiohttp.client.ClientSession.request')
+    @async_test
+    async def test_return_false_and_warning_log_when_temp_file_can_not_be_written(
+        self, mock_iorequest, mock_open
+    ):
+        mock_iorequest.return_value = MockResponse(read=self.img_file_content, headers=self.headers)
+        mock_open.side_effect = PermissionError
+        with self.assertLogs() as captured_log:
+            method_return = await self.instance._XkcdAsyncDownloader__get_image_file(
+                self.comic_id, self.image_url, ClientSession()
+            )
+        self.assertEqual(
+            captured_log.output[0],
+            f'WARNING:root:Error PermissionError when download image file for comic id: {self.comic_id}'
+        )
+        self.assertFalse(method_return)
+
+
+class TestTaskOfMetadataStage(unittest.TestCase):
+    def setUp(self) -> None:
+        self.instance = XkcdAsyncDownloader()
+        self.sources = SourcePool([SourceClient(ComicSource(), 'client_session_instance', MagicMock())])
+        self.comic_id = 2579
+        self.comic_data = {
+            'image_url': 'https://imgs.xkcd.com/comics/tractor_beam.png', 'etag': '"api-etag"',
+            'last_modified': None
+        }
+        self.image_stage = MagicMock()
+
+    async def awaited_return(self, arg=''):
+        sleep(0)
+        return arg
+
+    @patch.object(XkcdAsyncDownloader, '_XkcdAsyncDownloader__get_comic_data',
+                  new_callable=MagicMock)
+    @async_test
+    async def test_put_comic_data_in_image_stage(self, mock_get_comic_data):
+        mock_get_comic_data.return_value = self.awaited_return(self.comic_data)
+        self.image_stage.put.return_value = self.awaited_return()
+        await self.instance._XkcdAsyncDownloader__task_of_metadata_stage(
+            self.comic_id, self.sources, self.image_stage
+        )
+        mock_get_comic_data.assert_called_once_with(self.comic_id, self.sources, None)
+        self.image_stage.put.assert_called_once_with((self.comic_id, self.comic_data, None))
+
+    @patch.object(MetadataWriter, 'write')
+    @patch.object(XkcdAsyncDownloader, '_XkcdAsyncDownloader__get_comic_data',
+                  new_callable=MagicMock)
+    @async_test
+    async def test_write_full_metadata_and_put_comic_data_without_it(
+        self, mock_get_comic_data, mock_write
+    ):
+        metadata = get_api_json_fixture()
+        mock_get_comic_data.return_value = self.awaited_return({**self.comic_data, 'metadata': metadata})
+        self.image_stage.put.return_value = self.awaited_return()
+        await self.instance._XkcdAsyncDownloader__task_of_metadata_stage(
+            self.comic_id, self.sources, self.image_stage
+        )
+        mock_write.assert_called_once_with(metadata)
+        self.image_stage.put.assert_called_once_with((self.comic_id, self.comic_data, None))
+
+    @patch.object(ComicIndex, 'add_failed')
+    @patch.object(XkcdAsyncDownloader, '_XkcdAsyncDownloader__get_comic_data',
+                  new_callable=MagicMock)
+    @async_test
+    async def test_mark_comic_as_failed_when_image_url_is_false(self, mock_get_comic_data, mock_add_failed):
+        mock_get_comic_data.return_value = self.awaited_return(False)
+        method_return = await self.instance._XkcdAsyncDownloader__task_of_metadata_stage(
+            self.comic_id, self.sources, self.image_stage
+        )
+        self.assertIsNone(method_return)
+        mock_add_failed.assert_called_once_with(self.comic_id)
+        self.image_stage.put.assert_not_called()
+
+
+class TestTaskOfImageStage(unittest.TestCase):
     def setUp(self) -> None:
         self.instance = XkcdAsyncDownloader()
         self.session = 'client_session_instance'
+        self.sources = SourcePool([SourceClient(ComicSource(), self.session, MagicMock())])
         self.comic_id = 2579
         self.image_url = 'https://imgs.xkcd.com/comics/tractor_beam.png'
-        self.image_file_data = {'content': get_img_file_binary_content(), 'extension': 'png'}
+        self.md5_hash = '2f00e94162e4023b0270a3f309588075'
+        self.image_file_data = {
+            'temp_path': f'comics-xkcd/.{self.comic_id}.part', 'md5': self.md5_hash,
+            'size': 79575, 'extension': 'png', 'etag': '6203fd39-136d7',
+            'last_modified': 'Wed, 09 Feb 2022 17:43:21 GMT'
+        }
+        self.comic_data = {'image_url': self.image_url, 'etag': '"api-etag"', 'last_modified': None}
 
     async def awaited_return(self, arg=''):
         sleep(0)
         return arg
 
-    @patch.object(XkcdAsyncDownloader, '_XkcdAsyncDownloader__save_file_in_local_storage')
-    @patch.object(XkcdAsyncDownloader, '_XkcdAsyncDownloader__get_image_file')
-    @patch.object(XkcdAsyncDownloader, '_XkcdAsyncDownloader__get_comic_image_url')
+    @patch.object(ComicIndex, 'add')
+    @patch.object(XkcdAsyncDownloader, '_XkcdAsyncDownloader__save_file_in_local_storage',
+                  new_callable=MagicMock)
+    @patch.object(XkcdAsyncDownloader, '_XkcdAsyncDownloader__get_image_file', new_callable=MagicMock)
     @async_test
     async def test_call_methods_with_corrects_arguments_and_returns(
-        self, mock_get_comic_image_url, mock_get_image_file, mock_save_file_in_local_storage
+        self, mock_get_image_file, mock_save_file_in_local_storage, mock_index_add
     ):
-        mock_get_comic_image_url.return_value = self.awaited_return(self.image_url)
         mock_get_image_file.return_value = self.awaited_return(self.image_file_data)
-        mock_save_file_in_local_storage.return_value = self.awaited_return()
-        await self.instance._XkcdAsyncDownloader__task_of_downloader(self.comic_id, self.session)
+        mock_save_file_in_local_storage.return_value = self.awaited_return(self.md5_hash)
+        await self.instance._XkcdAsyncDownloader__task_of_image_stage(
+            (self.comic_id, self.comic_data, None), self.sources
+        )
 
-        mock_get_comic_image_url.assert_called_once_with(self.comic_id, self.session)
-        mock_get_image_file.assert_called_once_with(self.comic_id, self.image_url, self.session)
+        mock_get_image_file.assert_called_once_with(
+            self.comic_id, self.image_url, self.session, None, ComicSource()
+        )
         mock_save_file_in_local_storage.assert_called_once_with(
-            self.comic_id, self.image_file_data['content'], self.image_file_data['extension']
+            self.comic_id, self.image_file_data['temp_path'], self.md5_hash, 'png'
         )
-
-    @patch.object(XkcdAsyncDownloader, '_XkcdAsyncDownloader__get_comic_image_url')
+        mock_index_add.assert_called_once_with(ComicRecord(
+            self.comic_id, self.image_url, self.md5_hash, 'png', 79575, '6203fd39-136d7',
+            'Wed, 09 Feb 2022 17:43:21 GMT', '"api-etag"', None
+        ))
+
+    @patch.object(ComicIndex, 'add')
+    @patch.object(XkcdAsyncDownloader, '_XkcdAsyncDownloader__save_file_in_local_storage',
+                  new_callable=MagicMock)
+    @patch.object(XkcdAsyncDownloader, '_XkcdAsyncDownloader__get_image_file', new_callable=MagicMock)
     @async_test
-    async def test_return_false_when_image_url_is_false(self, mock_get_comic_image_url):
-        mock_get_comic_image_url.return_value = self.awaited_return(False)
-        method_return = await self.instance._XkcdAsyncDownloader__task_of_downloader(
-            self.comic_id, self.session
+    async def test_keep_indexed_file_and_update_validators_when_image_is_not_modified(
+        self, mock_get_image_file, mock_save_file_in_local_storage, mock_index_add
+    ):
+        record = ComicRecord(self.comic_id, self.image_url, self.md5_hash, 'png', 79575, '6203fd39-136d7')
+        mock_get_image_file.return_value = self.awaited_return({'not_modified': True})
+        await self.instance._XkcdAsyncDownloader__task_of_image_stage(
+            (self.comic_id, self.comic_data, record), self.sources
         )
-        self.assertIsNone(method_return)
 
-    @patch.object(XkcdAsyncDownloader, '_XkcdAsyncDownloader__get_image_file')
-    @patch.object(XkcdAsyncDownloader, '_XkcdAsyncDownloader__get_comic_image_url')
+        mock_get_image_file.assert_called_once_with(
+            self.comic_id, self.image_url, self.session, record, ComicSource()
+        )
+        mock_save_file_in_local_storage.assert_not_called()
+        mock_index_add.assert_called_once_with(record._replace(api_etag='"api-etag"'))
+
+    @patch.object(ComicIndex, 'add_failed')
+    @patch.object(XkcdAsyncDownloader, '_XkcdAsyncDownloader__get_image_file', new_callable=MagicMock)
     @async_test
-    async def test_return_false_when_image_file_data_is_false(
-        self, mock_get_comic_image_url, mock_get_comic_image_file
+    async def test_mark_comic_as_failed_when_image_file_data_is_false(
+        self, mock_get_comic_image_file, mock_add_failed
     ):
-        mock_get_comic_image_url.return_value = self.awaited_return(self.image_url)
         mock_get_comic_image_file.return_value = self.awaited_return(False)
-        method_return = await self.instance._XkcdAsyncDownloader__task_of_downloader(
-            self.comic_id, self.session
+        method_return = await self.instance._XkcdAsyncDownloader__task_of_image_stage(
+            (self.comic_id, self.comic_data, None), self.sources
         )
         self.assertIsNone(method_return)
+        mock_add_failed.assert_called_once_with(self.comic_id)
+
+
+class TestDownloadInsideEventLoop(unittest.TestCase):
+    def setUp(self) -> None:
+        self.instance = XkcdAsyncDownloader()
+        self.instance.DIRECTORY = 'directory_of_test'
+
+    def tearDown(self) -> None:
+        rmtree(self.instance.DIRECTORY, ignore_errors=True)
+
+    @patch.object(LocalStorage, 'scan')
+    @async_test
+    async def test_scan_archive_and_write_metrics_outside_event_loop_thread(self, mock_scan):
+        threads = []
+        mock_scan.side_effect = lambda *args: threads.append(threading.current_thread())
+        with patch('src.xkcd_async_downloader.write_text_atomically') as mock_write:
+            mock_write.side_effect = lambda *args: threads.append(threading.current_thread())
+            self.assertEqual([], await self.instance.download_range(1, 0))
+
+        mock_scan.assert_called_once_with('directory_of_test', ('by-id', 'metadata'))
+        self.assertEqual(2, len(threads))
+        self.assertNotIn(threading.current_thread(), threads)
+
+
+class TestConfigureSources(unittest.TestCase):
+    def setUp(self) -> None:
+        self.instance = XkcdAsyncDownloader()
+
+    def test_use_settings_overridden_on_instance_after_construction(self):
+        self.instance.URL_API = 'http://127.0.0.1/{}/info.0.json'
+        self.instance.RATE_LIMIT = 5.0
+        self.instance._XkcdAsyncDownloader__configure_sources()
+        sources = self.instance._XkcdAsyncDownloader__sources
+        self.assertEqual(['http://127.0.0.1/{}/info.0.json'], [source.url_api for source in sources])
+        self.assertEqual(
+            {'xkcd': {'rate': 5.0, 'limit': 10, 'in_flight': 0}}, self.instance.rate_limiter_metrics
+        )
+
+    def test_keep_rate_limiter_of_unchanged_source(self):
+        rate_limiters = self.instance._XkcdAsyncDownloader__rate_limiters
+        self.instance._XkcdAsyncDownloader__configure_sources()
+        self.assertIs(rate_limiters['xkcd'], self.instance._XkcdAsyncDownloader__rate_limiters['xkcd'])
+
+    def test_report_gauges_of_each_source(self):
+        self.instance.SOURCES = (ComicSource('xkcd'), ComicSource('mirror', rate_limit=10.0))
+        self.instance._XkcdAsyncDownloader__configure_sources()
+        gauges = self.instance.metrics.to_dict()['gauges']
+        self.assertEqual({'{source="mirror"}': 10.0, '{source="xkcd"}': 20.0}, gauges['rate_limit'])
+        self.assertEqual({'{source="mirror"}': 0, '{source="xkcd"}': 0}, gauges['in_flight_requests'])
+        self.assertEqual(['mirror', 'xkcd'], sorted(self.instance.rate_limiter_metrics))
+
+
+class TestGetComicIdsToDownload(unittest.TestCase):
+    def setUp(self) -> None:
+        self.instance = XkcdAsyncDownloader()
+        self.index = self.instance._XkcdAsyncDownloader__comic_index
+        self.index.open(':memory:')
+        for comic_id in (1, 2, 4):
+            self.index.add(ComicRecord(comic_id, '', '', 'png', 0))
+        self.index.add_failed(3)
+        self.index.set_last_crawled_id(5)
+
+    def tearDown(self) -> None:
+        self.index.close()
+
+    def test_skip_indexed_comics_in_full_mode(self):
+        method_return = self.instance._XkcdAsyncDownloader__get_comic_ids_to_download(7, False)
+        self.assertEqual([3, 5, 6, 7], list(method_return))
+        self.assertEqual(3, self.instance.metrics.get_counter('skips_total', reason='indexed'))
+
+    def test_return_failed_and_new_comics_in_incremental_mode(self):
+        self.index.add_failed(5)
+        method_return = self.instance._XkcdAsyncDownloader__get_comic_ids_to_download(7, True)
+        self.assertEqual([3, 5, 6, 7], list(method_return))
+
+    def test_return_only_failed_comics_in_retry_mode(self):
+        method_return = self.instance._XkcdAsyncDownloader__get_comic_ids_to_download(7, False, True)
+        self.assertEqual([3], list(method_return))
+
+    def test_return_nothing_in_incremental_mode_when_there_are_no_new_comics(self):
+        self.index.add(ComicRecord(3, '', '', 'png', 0))
+        method_return = self.instance._XkcdAsyncDownloader__get_comic_ids_to_download(5, True)
+        self.assertEqual([], list(method_return))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,66 @@
+import asyncio
+import logging
+
+from typing import Any, Awaitable, Callable, Iterable, List
+
+
+class WorkScheduler:
+    def __init__(self, handler: Callable[[Any], Awaitable[None]], concurrency: int,
+                 queue_size: int = 0) -> None:
+        self.__handler = handler
+        self.__concurrency = concurrency
+        self.__queue_size = queue_size or concurrency * 2
+        self.__queue = None
+        self.__workers: List[asyncio.Task] = []
+        self.__active_workers = 0
+
+    @property
+    def concurrency(self) -> int:
+        return self.__concurrency
+
+    @property
+    def queue_depth(self) -> int:
+        return self.__queue.qsize() if self.__queue else 0
+
+    @property
+    def active_workers(self) -> int:
+        return self.__active_workers
+
+    async def run(self, items: Iterable[Any]) -> None:
+        self.start()
+        try:
+            for item in items:
+                await self.put(item)
+            await self.join()
+        finally:
+            await self.stop()
+
+    def start(self) -> None:
+        self.__queue = asyncio.Queue(maxsize=self.__queue_size)
+        self.__workers = [asyncio.ensure_future(self.__worker()) for _ in range(self.__concurrency)]
+
+    async def put(self, item: Any) -> None:
+        await self.__queue.put(item)
+
+    async def join(self) -> None:
+        await self.__queue.join()
+
+    async def stop(self) -> None:
+        for worker in self.__workers:
+            worker.cancel()
+        await asyncio.gather(*self.__workers, return_exceptions=True)
+        self.__workers = []
+
+    async def __worker(self) -> None:
+        while True:
+            item = await self.__queue.get()
+            self.__active_workers += 1
+            try:
+                await self.__handler(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error('Error %s in scheduled task for item: %s', type(e).__name__, item)
+            finally:
+                self.__active_workers -= 1
+                self.__queue.task_done()
@@ -1,157 +1,834 @@
 import asyncio
+import glob
+import json
 import logging
 import os
+import time
 
-import aiofiles
 import aiohttp
 
+from contextlib import AsyncExitStack, asynccontextmanager
 from hashlib import md5
-from typing import Union
+from typing import Any, AsyncIterator, Callable, Coroutine, Dict, Iterable, List, Optional, Tuple, Union
+
+from src import defaults
+from src.blob_layout import BlobLayout
+from src.checkpoint_journal import CheckpointJournal, JournalState, load_journal
+from src.comic_index import ComicIndex, ComicRecord, ComicResult
+from src.comic_source import ComicSource, SourceClient, SourcePool
+from src.connector_profile import ConnectorProfile
+from src.cpu_executor import CpuExecutor, hash_file
+from src.local_storage import LocalStorage
+from src.loop_monitor import LoopLagMonitor
+from src.metadata_export import MetadataWriter, append_metadata_file
+from src.metrics import Metrics, write_text_atomically
+from src.rate_limiter import AdaptiveRateLimiter, BodyReader, RateLimitedSession, fetch_response
+from src.retry_policy import DEFAULT_RETRY_POLICIES, get_error_class
+from src.sharding import (
+    SHARD_INDEX_FILE, create_shard_executor, get_importable_class, get_shard_metadata_file,
+    get_shard_settings, run_shard, split_comic_ids
+)
+from src.work_scheduler import WorkScheduler
 
 
 class XkcdAsyncDownloader:
-    DIRECTORY: str = 'comics-xkcd'
-    URL_API: str = 'https://xkcd.com/{}/info.0.json'
-    TIMEOUT: int = 30
+    DIRECTORY: str = defaults.DEFAULT_DIRECTORY
+    URL_API: str = defaults.DEFAULT_URL_API
+    CONCURRENCY: int = 20
+    API_CONCURRENCY: int = 10
+    IMAGE_CONCURRENCY: int = 10
+    PIPELINE_QUEUE_SIZE: int = 50
+    CONNECTOR_PROFILE: ConnectorProfile = ConnectorProfile()
+    INDEX_FILE: str = defaults.INDEX_FILE
+    BLOB_LAYOUT: BlobLayout = BlobLayout()
+    CHUNK_SIZE: int = 64 * 1024
+    WRITE_WORKERS: int = 4
+    FSYNC_BATCH_SIZE: int = 0
+    RETRY_POLICIES: dict = DEFAULT_RETRY_POLICIES
+    RATE_LIMIT: float = 20.0
+    MAX_RATE_LIMIT: float = 100.0
+    SOURCES: Tuple[ComicSource, ...] = ()
+    METRICS_FILE: Optional[str] = '.metrics.json'
+    PROMETHEUS_FILE: Optional[str] = None
+    PROMETHEUS_INTERVAL: float = 15.0
+    PROGRESS_INTERVAL: float = 10.0
+    SHARDS: int = 1
+    CPU_EXECUTOR: str = 'thread'
+    CPU_WORKERS: int = 2
+    CPU_OFFLOAD_MIN_SIZE: int = 64 * 1024
+    LOOP_LAG_INTERVAL: float = 0.1
+    JOURNAL_FILE: Optional[str] = defaults.JOURNAL_FILE
+    JOURNAL_BATCH_SIZE: int = 100
+    JOURNAL_FLUSH_INTERVAL: float = 1.0
+    METADATA_FILE: Optional[str] = defaults.METADATA_FILE
+    METADATA_BATCH_SIZE: int = 100
 
     def __init__(self) -> None:
-        logging.basicConfig(format='[%(asctime)s][%(levelname)s] %(message)s', level=logging.INFO)
         self.__count_of_saved_files = 0
+        self.__comic_index = ComicIndex()
+        self.__storage = LocalStorage(self.WRITE_WORKERS, self.FSYNC_BATCH_SIZE)
+        self.__cpu_executor = CpuExecutor(self.CPU_EXECUTOR, self.CPU_WORKERS, self.CPU_OFFLOAD_MIN_SIZE)
+        self.__refresh = False
+        self.__journal = CheckpointJournal()
+        self.__metadata_writer = MetadataWriter()
+        self.__results: Optional[asyncio.Queue] = None
+        self.__sources: Tuple[ComicSource, ...] = ()
+        self.__rate_limiters: Dict[str, AdaptiveRateLimiter] = {}
+        self.__rate_limiter_settings: Dict[str, tuple] = {}
+        self.__metrics = Metrics()
+        self.__started = time.perf_counter()
+        self.__run_lock: Optional[asyncio.Lock] = None
+        self.__run_lock_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.__configure_sources()
 
     @property
     def get_amout_of_saved_files(self):
         return self.__count_of_saved_files
 
-    def make_download(self) -> None:
-        if not self.__create_directory():
+    @property
+    def rate_limiter_metrics(self) -> dict:
+        return {name: rate_limiter.metrics for name, rate_limiter in self.__rate_limiters.items()}
+
+    @property
+    def metrics(self) -> Metrics:
+        return self.__metrics
+
+    def make_download(self, incremental: bool = False, refresh: bool = False, retry_failed: bool = False,
+                      shards: Optional[int] = None, resume: bool = False,
+                      loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        self.__run_until_complete(self.download(incremental, refresh, retry_failed, shards, resume), loop)
+
+    def download_comics(self, comic_ids: Iterable[int], refresh: bool = False,
+                        loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        self.__run_until_complete(
+            self.__run(lambda: self.__create_tasks_of_downloader(comic_ids=comic_ids), refresh), loop
+        )
+
+    async def download(self, incremental: bool = False, refresh: bool = False, retry_failed: bool = False,
+                       shards: Optional[int] = None, resume: bool = False,
+                       session: Optional[aiohttp.ClientSession] = None) -> None:
+        shards = shards or self.SHARDS
+        if shards > 1:
+            await self.__run(
+                lambda: self.__create_sharded_tasks(incremental, retry_failed, shards, session), refresh
+            )
             return
-        loop = asyncio.get_event_loop()
-        loop.run_until_complete(self.__create_tasks_of_downloader())
-        loop.close()
-
-    async def __create_tasks_of_downloader(self):
-        timeout = aiohttp.ClientTimeout(total=self.TIMEOUT)
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            last_index = await self.__get_last_index(session)
-            if not last_index:
+
+        journal_path = f'{self.DIRECTORY}/{self.JOURNAL_FILE}' if self.JOURNAL_FILE else None
+        journal = CheckpointJournal(
+            journal_path, self.JOURNAL_BATCH_SIZE, before_flush=lambda: self.__metadata_writer.flush()
+        )
+        journal_state = load_journal(journal_path) if journal_path else None
+        if resume and journal_state:
+            incremental = journal_state.header['incremental']
+            refresh = journal_state.header['refresh']
+            retry_failed = journal_state.header['retry_failed']
+        elif resume:
+            logging.info('There is no checkpoint journal to resume, starting a new run')
+        await self.__run(lambda: self.__create_tasks_of_downloader(
+            incremental, retry_failed, journal_state=journal_state, resume=resume, session=session
+        ), refresh, journal)
+
+    async def iter_download(self, comic_ids: Optional[Iterable[int]] = None, refresh: bool = False,
+                            session: Optional[aiohttp.ClientSession] = None) -> AsyncIterator[ComicResult]:
+        results: asyncio.Queue = asyncio.Queue(maxsize=self.IMAGE_CONCURRENCY * 2)
+        run = asyncio.ensure_future(self.__run(
+            lambda: self.__create_tasks_of_downloader(comic_ids=comic_ids, session=session), refresh,
+            results=results
+        ))
+        try:
+            while not run.done() or not results.empty():
+                next_result = asyncio.ensure_future(results.get())
+                await asyncio.wait({next_result, run}, return_when=asyncio.FIRST_COMPLETED)
+                if next_result.done():
+                    yield next_result.result()
+                else:
+                    next_result.cancel()
+            await run
+        finally:
+            if not run.done():
+                run.cancel()
+                await asyncio.gather(run, return_exceptions=True)
+
+    async def download_comic(self, comic_id: int, refresh: bool = False,
+                             session: Optional[aiohttp.ClientSession] = None) -> Optional[ComicResult]:
+        results = await self.download_range(comic_id, comic_id, refresh, session)
+        return results[0] if results else None
+
+    async def download_range(self, first_id: int, last_id: int, refresh: bool = False,
+                             session: Optional[aiohttp.ClientSession] = None) -> List[ComicResult]:
+        comic_ids = range(first_id, last_id + 1)
+        return sorted([result async for result in self.iter_download(comic_ids, refresh, session)])
+
+    @staticmethod
+    def __run_until_complete(coroutine: Coroutine, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        if loop is not None:
+            loop.run_until_complete(coroutine)
+            return
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(coroutine)
+        finally:
+            if hasattr(loop, 'shutdown_default_executor'):
+                loop.run_until_complete(loop.shutdown_default_executor())
+            loop.close()
+
+    async def __run(
+        self, create_tasks: Callable[[], Coroutine], refresh: bool,
+        journal: Optional[CheckpointJournal] = None, results: Optional[asyncio.Queue] = None
+    ) -> None:
+        # The index, storage, writers and metrics below belong to the running call, so runs of one instance
+        # wait for each other instead of closing that state under a run still in progress.
+        async with self.__get_run_lock():
+            if not self.__create_directory():
                 return
+            self.__journal = journal or CheckpointJournal()
+            self.__results = results
+            self.__refresh = refresh
+            self.__started = time.perf_counter()
+            self.__metrics = Metrics()
+            self.__configure_sources()
+            self.__comic_index.open(f'{self.DIRECTORY}/{self.INDEX_FILE}')
+            try:
+                await asyncio.get_event_loop().run_in_executor(
+                    None, self.__storage.scan, self.DIRECTORY, self.__get_excluded_directories()
+                )
+                metadata_path = f'{self.DIRECTORY}/{self.METADATA_FILE}' if self.METADATA_FILE else None
+                self.__metadata_writer = MetadataWriter(metadata_path, self.METADATA_BATCH_SIZE)
+                logging.info('%d files found in "%s/"', self.__storage.amount_of_files, self.DIRECTORY)
+                await create_tasks()
+            finally:
+                self.__results = None
+                await self.__storage.close()
+                self.__cpu_executor.close()
+                self.__metadata_writer.flush()
+                self.__comic_index.close()
+                await self.__export_metrics()
+
+    def __get_run_lock(self) -> asyncio.Lock:
+        # Before Python 3.10 a lock is bound to the loop it was created in, and make_download runs each call
+        # in a new loop.
+        loop = asyncio.get_event_loop()
+        if self.__run_lock is None or self.__run_lock_loop is not loop:
+            self.__run_lock = asyncio.Lock()
+            self.__run_lock_loop = loop
+        return self.__run_lock
+
+    def __configure_sources(self) -> None:
+        # Settings are read again at the start of each run, so overrides made on the instance apply; a source
+        # whose settings did not change keeps its rate limiter and what it has learned.
+        self.__sources = self.SOURCES or (ComicSource(
+            'xkcd', self.URL_API, self.RATE_LIMIT, self.MAX_RATE_LIMIT, self.CONNECTOR_PROFILE
+        ),)
+        rate_limiters = {}
+        rate_limiter_settings = {}
+        for source in self.__sources:
+            settings = (source.rate_limit, source.max_rate_limit, self.CONCURRENCY)
+            rate_limiter = self.__rate_limiters.get(source.name)
+            if rate_limiter is None or self.__rate_limiter_settings[source.name] != settings:
+                rate_limiter = AdaptiveRateLimiter(
+                    rate=source.rate_limit, max_rate=source.max_rate_limit,
+                    limit=max(self.CONCURRENCY // 2, 1), max_limit=self.CONCURRENCY
+                )
+            rate_limiters[source.name] = rate_limiter
+            rate_limiter_settings[source.name] = settings
+        self.__rate_limiters = rate_limiters
+        self.__rate_limiter_settings = rate_limiter_settings
+
+        for name in ('in_flight_requests', 'rate_limit', 'concurrency_limit'):
+            self.__metrics.remove_gauge(name)
+        for name, limiter in rate_limiters.items():
+            self.__metrics.register_gauge('in_flight_requests', lambda r=limiter: r.in_flight, source=name)
+            self.__metrics.register_gauge('rate_limit', lambda r=limiter: r.rate, source=name)
+            self.__metrics.register_gauge('concurrency_limit', lambda r=limiter: r.limit, source=name)
+
+    @asynccontextmanager
+    async def __open_sources(
+        self, session: Optional[aiohttp.ClientSession] = None
+    ) -> AsyncIterator[SourcePool]:
+        async with AsyncExitStack() as stack:
+            clients = []
+            for source in self.__sources:
+                client_session = session or await stack.enter_async_context(aiohttp.ClientSession(
+                    timeout=source.connector_profile.create_timeout(),
+                    connector=source.connector_profile.create_connector()
+                ))
+                rate_limiter = self.__rate_limiters[source.name]
+                rate_limited_session = RateLimitedSession(client_session, rate_limiter)
+                clients.append(SourceClient(source, rate_limited_session, rate_limiter))
+            yield SourcePool(clients)
+
+    async def __publish_result(self, comic_id: int, status: str,
+                               record: Optional[ComicRecord] = None) -> None:
+        if self.__results is not None:
+            await self.__results.put(ComicResult(comic_id, status, record))
+
+    async def __create_sharded_tasks(self, incremental: bool, retry_failed: bool, shards: int,
+                                     session: Optional[aiohttp.ClientSession] = None) -> None:
+        self.__merge_shard_indexes()
+        async with self.__open_sources(session) as sources:
+            last_index = await self.__get_last_index_of_sources(sources)
+        if not last_index:
+            return
+
+        comic_ids = list(self.__get_comic_ids_to_download(last_index, incremental, retry_failed))
+        downloader_class = get_importable_class(type(self))
+        loop = asyncio.get_event_loop()
+        logging.info('Sharded mode: %d comics split across %d processes', len(comic_ids), shards)
+        with create_shard_executor(shards) as executor:
+            results = await asyncio.gather(*(
+                loop.run_in_executor(
+                    executor, run_shard, downloader_class, get_shard_settings(self, shard_id, shards),
+                    shard_ids, self.__get_shard_records(shard_ids), self.__refresh
+                )
+                for shard_id, shard_ids in enumerate(split_comic_ids(comic_ids, shards))
+            ), return_exceptions=True)
+
+        failed_shards = 0
+        for shard_id, result in enumerate(results):
+            if isinstance(result, BaseException):
+                logging.error('Error %s in shard: %d', type(result).__name__, shard_id)
+                failed_shards += 1
+                continue
+            self.__count_of_saved_files += result['saved_files']
+            self.__metrics.merge(result['metrics'])
+        self.__merge_shard_indexes()
+        self.__report_progress()
+        if not retry_failed and not failed_shards:
+            self.__comic_index.set_last_crawled_id(last_index)
+
+    def __get_shard_records(self, comic_ids: Iterable[int]) -> list:
+        if not self.__refresh:
+            return []
+        return [record for record in map(self.__comic_index.get, comic_ids) if record]
+
+    def __merge_shard_indexes(self) -> None:
+        for shard_index_path in sorted(glob.glob(f'{self.DIRECTORY}/{SHARD_INDEX_FILE.format("*")}')):
+            self.__comic_index.merge(shard_index_path)
+            os.remove(shard_index_path)
+        if not self.METADATA_FILE:
+            return
+        shard_metadata_pattern = get_shard_metadata_file(self.METADATA_FILE, '*')
+        for shard_metadata_path in sorted(glob.glob(f'{self.DIRECTORY}/{shard_metadata_pattern}')):
+            append_metadata_file(shard_metadata_path, f'{self.DIRECTORY}/{self.METADATA_FILE}')
+
+    def __get_excluded_directories(self) -> tuple:
+        excluded_directories = (self.BLOB_LAYOUT.links_directory,)
+        if self.METADATA_FILE and os.path.dirname(self.METADATA_FILE):
+            excluded_directories += (self.METADATA_FILE.split('/')[0],)
+        return excluded_directories
+
+    async def __create_tasks_of_downloader(self, incremental: bool = False, retry_failed: bool = False,
+                                           comic_ids: Optional[Iterable[int]] = None,
+                                           journal_state: Optional[JournalState] = None,
+                                           resume: bool = False,
+                                           session: Optional[aiohttp.ClientSession] = None) -> None:
+        async with self.__open_sources(session) as sources:
+            last_index = None
+            pending_images = []
+            if journal_state:
+                self.__replay_journal(journal_state)
+            if journal_state and resume:
+                last_index = journal_state.header['last_index']
+                comic_ids, pending_images = self.__get_pending_work_of_journal(
+                    journal_state, self.__get_comic_ids_to_download(last_index, incremental, retry_failed)
+                )
+                self.__journal.open(journal_state.header, resume=True)
+            elif comic_ids is None:
+                last_index = await self.__get_last_index_of_sources(sources)
+                if not last_index:
+                    return
+                comic_ids = self.__get_comic_ids_to_download(last_index, incremental, retry_failed)
+                self.__journal.open({
+                    'incremental': incremental, 'refresh': self.__refresh, 'retry_failed': retry_failed,
+                    'last_index': last_index
+                })
+
+            image_stage = WorkScheduler(
+                lambda item: self.__task_of_image_stage(item, sources),
+                self.IMAGE_CONCURRENCY * len(self.__sources), self.PIPELINE_QUEUE_SIZE
+            )
+            metadata_stage = WorkScheduler(
+                lambda comic_id: self.__task_of_metadata_stage(comic_id, sources, image_stage),
+                self.API_CONCURRENCY * len(self.__sources)
+            )
+            self.__metrics.register_gauge('metadata_active_tasks', lambda: metadata_stage.active_workers)
+            self.__metrics.register_gauge('image_active_tasks', lambda: image_stage.active_workers)
+            self.__metrics.register_gauge('image_queue_depth', lambda: image_stage.queue_depth)
+            prometheus_exporter = asyncio.ensure_future(self.__export_prometheus_periodically())
+            progress_reporter = asyncio.ensure_future(self.__report_progress_periodically())
+            loop_lag_monitor = LoopLagMonitor(self.__metrics, self.LOOP_LAG_INTERVAL)
+            loop_lag_monitor.start()
+            journal_flusher = asyncio.ensure_future(self.__flush_journal_periodically())
+            image_stage.start()
+            try:
+                for item in pending_images:
+                    await image_stage.put(item)
+                await metadata_stage.run(comic_ids)
+                await image_stage.join()
+            finally:
+                await image_stage.stop()
+                prometheus_exporter.cancel()
+                progress_reporter.cancel()
+                loop_lag_monitor.stop()
+                journal_flusher.cancel()
+                self.__journal.close()
+                self.__report_progress()
+            if last_index and not retry_failed:
+                self.__comic_index.set_last_crawled_id(last_index)
+            self.__comic_index.commit()
+            if self.__journal.path and os.path.exists(self.__journal.path):
+                os.remove(self.__journal.path)
+            for name, rate_limiter in self.__rate_limiters.items():
+                logging.info('Rate limiter final state of %s: %s', name, rate_limiter.metrics)
+
+    def __replay_journal(self, state: JournalState) -> None:
+        for record in state.records.values():
+            self.__comic_index.add(record)
+        for comic_id in state.failed:
+            self.__comic_index.add_failed(comic_id)
+        self.__comic_index.commit()
+        logging.info(
+            '%d comic states have been recovered from the checkpoint journal', len(state.finished_ids)
+        )
+
+    def __get_pending_work_of_journal(self, state: JournalState, comic_ids: Iterable[int]) -> tuple:
+        finished_ids = state.finished_ids
+        pending_images = [
+            (comic_id, comic_data, self.__comic_index.get(comic_id) if self.__refresh else None)
+            for comic_id, comic_data in state.metadata.items() if comic_id not in finished_ids
+        ]
+        skipped_ids = finished_ids | set(state.metadata)
+        logging.info(
+            'Resume mode: %d comics already finished and %d comics waiting for the image stage',
+            len(finished_ids), len(pending_images)
+        )
+        return [i for i in comic_ids if i not in skipped_ids], pending_images
+
+    async def __flush_journal_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.JOURNAL_FLUSH_INTERVAL)
+            self.__journal.flush()
+
+    def __get_comic_ids_to_download(
+        self, last_index: int, incremental: bool, retry_failed: bool = False
+    ) -> Iterable[int]:
+        if retry_failed:
+            failed_ids = self.__comic_index.failed_ids()
+            logging.info('Retry mode: retrying %d failed comics', len(failed_ids))
+            return failed_ids
+
+        if self.__refresh:
+            logging.info('Refresh mode: indexed comics will be revalidated with conditional requests')
+            return range(1, last_index + 1)
 
-            tasks = [self.__task_of_downloader(i, session) for i in range(1, last_index + 1)]
-            await asyncio.gather(*tasks)
+        if incremental:
+            failed_ids = self.__comic_index.failed_ids()
+            last_crawled_id = self.__comic_index.get_last_crawled_id()
+            logging.info(
+                'Incremental mode: retrying %d failed comics and fetching comics after id: %d',
+                len(failed_ids), last_crawled_id
+            )
+            new_ids = range(last_crawled_id + 1, last_index + 1)
+            return [i for i in failed_ids if i <= last_crawled_id] + list(new_ids)
+
+        completed_ids = self.__comic_index.completed_ids()
+        logging.info('%d comics already indexed will be skipped', len(completed_ids))
+        self.__metrics.increment('skips_total', len(completed_ids), reason='indexed')
+        return (i for i in range(1, last_index + 1) if i not in completed_ids)
 
-    async def __task_of_downloader(self, comic_id: int, session: aiohttp.client.ClientSession) -> None:
-        comic_image_url = await self.__get_comic_image_url(comic_id, session)
-        if not comic_image_url:
+    async def __task_of_metadata_stage(
+        self, comic_id: int, sources: SourcePool, image_stage: WorkScheduler
+    ) -> None:
+        record = self.__comic_index.get(comic_id) if self.__refresh else None
+
+        comic_data = await self.__get_comic_data(comic_id, sources, record)
+        if not comic_data:
+            self.__comic_index.add_failed(comic_id)
+            self.__journal.record_failed(comic_id)
+            await self.__publish_result(comic_id, 'failed')
             return
 
-        image_file_data = await self.__get_image_file(comic_id, comic_image_url, session)
+        metadata = comic_data.pop('metadata', None)
+        if metadata:
+            self.__metadata_writer.write(metadata)
+        self.__journal.record_metadata(comic_id, comic_data)
+        await image_stage.put((comic_id, comic_data, record))
+
+    async def __task_of_image_stage(self, item: tuple, sources: SourcePool) -> None:
+        comic_id, comic_data, record = item
+        comic_image_url = comic_data['image_url']
+        client = sources.get(comic_data.get('source'))
+
+        image_file_data = await self.__get_image_file(
+            comic_id, comic_image_url, client.session, record, client.source
+        )
         if not image_file_data:
+            self.__comic_index.add_failed(comic_id)
+            self.__journal.record_failed(comic_id)
+            await self.__publish_result(comic_id, 'failed')
+            return
+
+        if image_file_data.get('not_modified'):
+            self.__metrics.increment('skips_total', reason='not_modified')
+            record = record._replace(
+                api_etag=comic_data['etag'], api_last_modified=comic_data['last_modified']
+            )
+            self.__add_to_index(record)
+            await self.__publish_result(comic_id, 'not_modified', record)
+            return
+
+        file_hash = await self.__save_file_in_local_storage(
+            comic_id, image_file_data['temp_path'], image_file_data['md5'], image_file_data['extension']
+        )
+        if not file_hash:
+            self.__comic_index.add_failed(comic_id)
+            self.__journal.record_failed(comic_id)
+            await self.__publish_result(comic_id, 'failed')
             return
 
-        await self.__save_file_in_local_storage(comic_id, image_file_data['content'],
-                                                image_file_data['extension'])
+        record = ComicRecord(
+            comic_id, comic_image_url, file_hash, image_file_data['extension'],
+            image_file_data['size'], image_file_data['etag'], image_file_data['last_modified'],
+            comic_data['etag'], comic_data['last_modified']
+        )
+        self.__add_to_index(record)
+        await self.__publish_result(comic_id, 'stored', record)
+
+    def __add_to_index(self, record: ComicRecord) -> None:
+        self.__comic_index.add(record)
+        self.__journal.record_stored(record)
 
     async def __get_image_file(
-        self, comic_id: int, image_url: str, session: aiohttp.client.ClientSession
+        self, comic_id: int, image_url: str, session: aiohttp.client.ClientSession,
+        record: Optional[ComicRecord] = None, source: Optional[ComicSource] = None
     ) -> Union[bool, dict]:
+        headers = (source or self.__sources[0]).connector_profile.get_image_headers()
+        if record and record.image_url == image_url:
+            headers.update(self.__get_conditional_headers(record.etag, record.last_modified))
+
+        temp_path = f'{self.DIRECTORY}/.{comic_id}.part'
+        started = time.perf_counter()
         try:
-            response_img_file = await session.request('GET', image_url)
-        except Exception as e:
-            logging.warning((
-                f'Error {type(e).__name__} in request for comic id image file: {comic_id}')
+            response_img_file, streamed_file = await self.__fetch(
+                session, image_url, headers,
+                lambda response: self.__stream_image_file(comic_id, response, temp_path)
             )
+        except Exception as e:
+            logging.warning('Error %s in request for comic id image file: %s', type(e).__name__, comic_id)
+            self.__metrics.increment('errors_total', stage='image', type=type(e).__name__)
             return False
 
-        if response_img_file.status != 200:
-            logging.warning(
-                f'Error {response_img_file.status} in request for comic id image file: {comic_id}'
-            )
-            return False
+        async with response_img_file:
+            if response_img_file.status == 304:
+                logging.debug('Image file of comic id: %s has not been modified', comic_id)
+                return {'not_modified': True}
+
+            if response_img_file.status != 200:
+                logging.warning(
+                    'Error %d in request for comic id image file: %s', response_img_file.status, comic_id
+                )
+                self.__metrics.increment(
+                    'errors_total', stage='image', type=f'http_{response_img_file.status}'
+                )
+                return False
 
-        if not response_img_file.headers['Content-Type'].startswith('image'):
-            logging.warning(f'The file for comic id: {comic_id} is not a image')
+        if not streamed_file:
             return False
 
+        self.__metrics.observe('image_latency_seconds', time.perf_counter() - started)
+        self.__metrics.observe('hash_seconds', streamed_file['hash_time'])
+        self.__metrics.observe('write_seconds', streamed_file['write_time'])
+        self.__metrics.increment('bytes_total', streamed_file['size'], stage='image')
+
         image_file_data = {
-            'content': await response_img_file.read(),
-            'extension': response_img_file.headers['Content-Type'].split('/')[1]
+            'temp_path': temp_path,
+            'md5': streamed_file['md5'],
+            'size': streamed_file['size'],
+            'extension': response_img_file.headers['Content-Type'].split('/')[1],
+            'etag': response_img_file.headers.get('ETag'),
+            'last_modified': response_img_file.headers.get('Last-Modified')
         }
         return image_file_data
 
-    async def __get_comic_image_url(
-        self, comic_id: int, session: aiohttp.client.ClientSession
-    ) -> Union[bool, str]:
+    async def __stream_image_file(
+        self, comic_id: int, response: aiohttp.ClientResponse, temp_path: str
+    ) -> Union[bool, dict]:
+        if not response.headers['Content-Type'].startswith('image'):
+            logging.warning('The file for comic id: %s is not a image', comic_id)
+            self.__metrics.increment('errors_total', stage='image', type='not_image')
+            return False
+
+        file_hash = md5()
+        size = 0
+        hash_time = write_time = 0.0
         try:
-            response_img_url = await session.request('GET', self.URL_API.format(comic_id))
+            async with self.__storage.open_for_write(temp_path) as f:
+                async for chunk in response.content.iter_chunked(self.CHUNK_SIZE):
+                    chunk_started = time.perf_counter()
+                    if self.__cpu_executor.shares_memory:
+                        await self.__cpu_executor.run(file_hash.update, chunk, size=len(chunk))
+                    hashed = time.perf_counter()
+                    await f.write(chunk)
+                    hash_time += hashed - chunk_started
+                    write_time += time.perf_counter() - hashed
+                    size += len(chunk)
+            hash_started = time.perf_counter()
+            if self.__cpu_executor.shares_memory:
+                file_md5 = file_hash.hexdigest()
+            else:
+                file_md5 = await self.__cpu_executor.run(hash_file, temp_path)
+            hash_time += time.perf_counter() - hash_started
         except Exception as e:
-            logging.warning(f'Error {type(e).__name__} in request for comic id image file: {comic_id}')
+            await self.__storage.remove(temp_path)
+            if get_error_class(exception=e) in self.RETRY_POLICIES:
+                raise
+            logging.warning('Error %s when download image file for comic id: %s', type(e).__name__, comic_id)
+            self.__metrics.increment('errors_total', stage='image', type=type(e).__name__)
             return False
+        return {'md5': file_md5, 'size': size, 'hash_time': hash_time, 'write_time': write_time}
 
-        if response_img_url.status != 200:
-            logging.warning(
-                f'Error {response_img_url.status} in request for comic id image file: {comic_id}'
+    async def __get_comic_data(
+        self, comic_id: int, sources: SourcePool, record: Optional[ComicRecord] = None
+    ) -> Union[bool, dict]:
+        tried_sources = set()
+        client = sources.select()
+        while client:
+            self.__metrics.increment('metadata_requests_total', source=client.source.name)
+            comic_data = await self.__get_comic_image_url(comic_id, client.session, record, client.source)
+            if comic_data:
+                comic_data['source'] = client.source.name
+                return comic_data
+
+            tried_sources.add(client.source.name)
+            client = sources.select(tried_sources)
+            if client:
+                logging.info('Falling back to source %s for comic id: %s', client.source.name, comic_id)
+                self.__metrics.increment('source_fallbacks_total', source=client.source.name)
+        return False
+
+    async def __get_comic_image_url(
+        self, comic_id: int, session: aiohttp.client.ClientSession, record: Optional[ComicRecord] = None,
+        source: Optional[ComicSource] = None
+    ) -> Union[bool, dict]:
+        source = source or self.__sources[0]
+        headers = source.connector_profile.get_api_headers()
+        if record:
+            headers.update(self.__get_conditional_headers(record.api_etag, record.api_last_modified))
+
+        started = time.perf_counter()
+        try:
+            response_img_url, body = await self.__fetch(
+                session, source.get_metadata_url(comic_id), headers, lambda response: response.read()
             )
+        except Exception as e:
+            logging.warning('Error %s in request for comic id image file: %s', type(e).__name__, comic_id)
+            self.__metrics.increment('errors_total', stage='api', type=type(e).__name__)
             return False
 
-        json = await response_img_url.json()
-        image_url = json['img']
-        comic_title = json['title']
-        logging.info(
-            f'URL from image comic id: {comic_id}, title: {comic_title}, has been obtained from API'
-        )
-        return image_url
+        async with response_img_url:
+            if response_img_url.status == 304:
+                logging.debug('API data of comic id: %s has not been modified', comic_id)
+                self.__metrics.observe('api_latency_seconds', time.perf_counter() - started)
+                return {
+                    'image_url': record.image_url,
+                    'etag': record.api_etag,
+                    'last_modified': record.api_last_modified
+                }
+
+            if response_img_url.status != 200:
+                logging.warning(
+                    'Error %d in request for comic id image file: %s', response_img_url.status, comic_id
+                )
+                self.__metrics.increment('errors_total', stage='api', type=f'http_{response_img_url.status}')
+                return False
 
-    async def __get_last_index(self, session: aiohttp.client.ClientSession) -> Union[bool, int]:
+        self.__metrics.observe('api_latency_seconds', time.perf_counter() - started)
         try:
-            response_last_index = await session.request('GET', self.URL_API.format(''))
+            api_content = await self.__cpu_executor.run(json.loads, body, size=len(body))
+            image_url = source.parse_image_url(api_content)
+            comic_title = api_content['title']
         except Exception as e:
-            logging.error(
-                f'Error {type(e).__name__} in request last comic index from xkcd API'
+            logging.warning(
+                'Error %s when parsing API data of comic id: %s from %s',
+                type(e).__name__, comic_id, source.name
             )
+            self.__metrics.increment('errors_total', stage='api', type=type(e).__name__)
             return False
+        logging.debug(
+            'URL from image comic id: %s, title: %s, has been obtained from API', comic_id, comic_title
+        )
+        return {
+            'image_url': image_url,
+            'etag': response_img_url.headers.get('ETag'),
+            'last_modified': response_img_url.headers.get('Last-Modified'),
+            'metadata': api_content
+        }
+
+    async def __fetch(
+        self, session: aiohttp.client.ClientSession, url: str, headers: Optional[dict] = None,
+        read_body: Optional[BodyReader] = None
+    ) -> Tuple[aiohttp.ClientResponse, Any]:
+        # The body of a successful response is read inside the retry loop, so a timeout or a truncated
+        # payload while reading it is retried like a failed request.
+        attempt = 0
+        while True:
+            attempt += 1
+            self.__metrics.increment('requests_total')
+            try:
+                response, body = await fetch_response(session, 'GET', url, read_body, headers=headers or {})
+            except Exception as e:
+                error_class = get_error_class(exception=e)
+                policy = self.RETRY_POLICIES.get(error_class)
+                if not policy or attempt >= policy.attempts:
+                    raise
+                delay = policy.get_delay(attempt)
+                reason = type(e).__name__
+            else:
+                error_class = get_error_class(status=response.status)
+                policy = self.RETRY_POLICIES.get(error_class)
+                if not policy or attempt >= policy.attempts:
+                    return response, body
+                delay = policy.get_delay(attempt, response.headers.get('Retry-After'))
+                reason = response.status
+                response.release()
+
+            logging.warning('Error %s in request for url: %s, retrying in %.2fs (attempt %d of %d)',
+                            reason, url, delay, attempt, policy.attempts)
+            self.__metrics.increment('retries_total', error_class=error_class)
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def __get_conditional_headers(etag: Optional[str], last_modified: Optional[str]) -> dict:
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
 
-        if response_last_index.status != 200:
-            logging.error(f'Error {response_last_index.status} when getting last comic index from xkcd API')
+    async def __get_last_index_of_sources(self, sources: SourcePool) -> Union[bool, int]:
+        for client in sources.clients:
+            last_index = await self.__get_last_index(client.session, client.source)
+            if last_index:
+                return last_index
+        return False
+
+    async def __get_last_index(
+        self, session: aiohttp.client.ClientSession, source: Optional[ComicSource] = None
+    ) -> Union[bool, int]:
+        source = source or self.__sources[0]
+        try:
+            response_last_index, content = await self.__fetch(
+                session, source.get_latest_url(), source.connector_profile.get_api_headers(),
+                lambda response: response.json()
+            )
+        except Exception as e:
+            logging.error('Error %s in request last comic index from %s API', type(e).__name__, source.name)
             return False
 
-        json = await response_last_index.json()
-        last_index = json['num']
-        logging.info(f'Last comic index (comic id): {last_index}')
+        async with response_last_index:
+            if response_last_index.status != 200:
+                logging.error(
+                    'Error %d when getting last comic index from %s API',
+                    response_last_index.status, source.name
+                )
+                return False
+
+        try:
+            last_index = source.parse_latest_id(content)
+        except Exception as e:
+            logging.error('Error %s when parsing last comic index from %s API', type(e).__name__, source.name)
+            return False
+        logging.info('Last comic index (comic id): %d', last_index)
         return last_index
 
     async def __save_file_in_local_storage(
-        self, comic_id: int, file_content: bytes, file_extension: str
-    ) -> Union[None, bool]:
-        file_name = f'{md5(file_content).hexdigest()}.{file_extension}'
+        self, comic_id: int, temp_path: str, file_hash: str, file_extension: str
+    ) -> Union[None, str]:
+        file_name = self.BLOB_LAYOUT.get_blob_path(file_hash, file_extension)
         file_path = f'{self.DIRECTORY}/{file_name}'
 
-        if os.path.isfile(file_path):
-            logging.info(f'File of comic id: {comic_id} already exits with name: {file_name}')
-            return
-
         try:
-            async with aiofiles.open(file_path, 'wb') as f:
-                await f.write(file_content)
+            saved = await self.__storage.commit(temp_path, file_path)
         except Exception as e:
             logging.error(
-                f'Error {type(e).__name__} when save file image for '
-                f'comic id: {comic_id} with path: {file_path}'
+                'Error %s when save file image for comic id: %s with path: %s',
+                type(e).__name__, comic_id, file_path
             )
+            await self.__storage.remove(temp_path)
             return
 
-        logging.info(f'Comic id: {comic_id} has been saved with name: {file_name}')
+        link_path = self.BLOB_LAYOUT.get_link_path(comic_id, file_extension)
+        if link_path:
+            try:
+                await self.__storage.link(file_path, f'{self.DIRECTORY}/{link_path}', self.BLOB_LAYOUT.links)
+            except Exception as e:
+                logging.warning(
+                    'Error %s when link comic id: %s to file: %s', type(e).__name__, comic_id, file_name
+                )
+
+        if not saved:
+            logging.debug('File of comic id: %s already exits with name: %s', comic_id, file_name)
+            self.__metrics.increment('skips_total', reason='duplicate')
+            return file_hash
+
+        logging.debug('Comic id: %s has been saved with name: %s', comic_id, file_name)
         self.__count_of_saved_files += 1
-        return True
+        self.__metrics.increment('saved_files_total')
+        return file_hash
+
+    async def __export_prometheus_periodically(self) -> None:
+        if not self.PROMETHEUS_FILE:
+            return
+        loop = asyncio.get_event_loop()
+        while True:
+            await loop.run_in_executor(
+                None, write_text_atomically, self.PROMETHEUS_FILE, self.__metrics.to_prometheus()
+            )
+            await asyncio.sleep(self.PROMETHEUS_INTERVAL)
+
+    async def __report_progress_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.PROGRESS_INTERVAL)
+            self.__report_progress()
+
+    def __report_progress(self) -> None:
+        elapsed = max(time.perf_counter() - self.__started, 1e-9)
+        saved_files = self.__metrics.get_counter('saved_files_total')
+        logging.info(
+            'Progress: %d comics saved, %d skipped, %d failed, %.1f comics/s, %.2f MB/s',
+            saved_files, self.__metrics.get_counter_total('skips_total'),
+            self.__metrics.get_counter_total('errors_total'), saved_files / elapsed,
+            self.__metrics.get_counter_total('bytes_total') / 1024 ** 2 / elapsed
+        )
+
+    async def __export_metrics(self) -> None:
+        if not self.METRICS_FILE:
+            return
+        metrics_path = f'{self.DIRECTORY}/{self.METRICS_FILE}'
+        loop = asyncio.get_event_loop()
+        try:
+            await loop.run_in_executor(None, write_text_atomically, metrics_path, self.__metrics.to_json())
+            if self.PROMETHEUS_FILE:
+                await loop.run_in_executor(
+                    None, write_text_atomically, self.PROMETHEUS_FILE, self.__metrics.to_prometheus()
+                )
+        except Exception as e:
+            logging.error('Error %s when export metrics to: %s', type(e).__name__, metrics_path)
+            return
+        logging.info('Metrics summary has been written to: %s', metrics_path)
 
     def __create_directory(self) -> bool:
         try:
             os.mkdir(self.DIRECTORY)
         except FileExistsError:
-            logging.info(f'The directory: "{self.DIRECTORY}/" already exists')
+            logging.info('The directory: "%s/" already exists', self.DIRECTORY)
             return True
         except Exception as e:
-            logging.error(f'{type(e).__name__} when create directory "{self.DIRECTORY}/"')
+            logging.error('%s when create directory "%s/"', type(e).__name__, self.DIRECTORY)
             return False
         else:
-            logging.info(f'The directory: "{self.DIRECTORY}/" has been created')
+            logging.info('The directory: "%s/" has been created', self.DIRECTORY)
             return True